@@ -1,9 +1,16 @@
+import time
+import_start_time = time.perf_counter()
+
 import logging
 from utils.database import close_connection_to_database
+from utils.general.lazy_loading import log_startup_report
 from src.geospatial_analysis import analyze_geospatial
 from src.sentiment_pipeline import prompt_model_selection, preprocess_and_store_data, perform_selected_sentiment_analysis
 from src.pipeline_helpers import initialize_and_fetch_data
-import time
+from src.preprocess_pool import shutdown_preprocess_pool
+from src.roberta_pool import shutdown_roberta_pool
+
+import_seconds = time.perf_counter() - import_start_time
 
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 
@@ -51,6 +58,9 @@ def main():
     finally:
         # Commit changes and close the connection to the database
         close_connection_to_database(conn, cursor)
+        shutdown_preprocess_pool()
+        shutdown_roberta_pool()
+        log_startup_report(import_seconds)
         total_time = time.time() - start_time
         logging.info(f"Total execution time: {total_time // 60} minutes and {total_time % 60:.2f} seconds.")
 
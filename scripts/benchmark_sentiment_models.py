@@ -0,0 +1,38 @@
+"""
+This script benchmarks the registered transformer sentiment models on a local labeled
+sample. The sample is a JSON file holding a list of [text, label] pairs, where each
+label is one of 'Negative', 'Neutral', 'Positive', 'Slightly Negative' or 'Slightly
+Positive'. For each model it logs the throughput in texts per second, the batch latency
+percentiles and the share of texts whose label agrees with the sample, both exactly
+and by polarity, so the cheapest model that meets the accuracy bar can be chosen.
+"""
+
+import argparse
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.json.json_utils import load_json
+from src.model_registry import MODEL_REGISTRY
+from src.roberta_engine import ROBERTA_BACKEND
+from src.roberta_process_data import benchmark_sentiment_models
+import logging
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
+
+parser = argparse.ArgumentParser(description="Benchmark the registered sentiment models on a labeled sample.")
+parser.add_argument('--sample', default='data/labeled_sample.json', help="The JSON file of [text, label] pairs.")
+parser.add_argument('--models', nargs='+', default=list(MODEL_REGISTRY), help="The registered models to benchmark.")
+parser.add_argument('--backend', default=ROBERTA_BACKEND, help="The inference backend: 'pytorch', 'int8' or 'onnx'.")
+args = parser.parse_args()
+
+sample = load_json(args.sample)
+if sample is None:
+    sys.exit(1)
+
+texts = [text for text, _ in sample]
+labels = [label for _, label in sample]
+logging.info(f"Benchmarking {len(args.models)} models on {len(texts)} labeled texts from {args.sample}.")
+benchmark_sentiment_models(texts, labels, args.models, backend=args.backend)
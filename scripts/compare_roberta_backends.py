@@ -0,0 +1,32 @@
+"""
+This script compares the RoBERTa inference backends (fp32 PyTorch, int8 dynamically
+quantized PyTorch and ONNX Runtime) on a sample of posts from 'data/content.json',
+the file written by export_content_to_json.py. For each backend it logs the model
+load time, the throughput in texts per second and the share of labels that agree
+with the fp32 PyTorch baseline.
+"""
+
+import argparse
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.json.json_utils import load_json
+from src.roberta_process_data import compare_roberta_backends
+import logging
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
+
+parser = argparse.ArgumentParser(description="Compare the RoBERTa inference backends on a sample of posts.")
+parser.add_argument('--sample-size', type=int, default=1000, help="The number of posts to analyze.")
+parser.add_argument('--backends', nargs='+', default=['pytorch', 'int8', 'onnx'], help="The backends to compare.")
+args = parser.parse_args()
+
+# Path to the JSON file with the sample posts
+json_file_path = 'data/content.json'
+
+sample = [content for _, content in load_json(json_file_path)["index"][:args.sample_size]]
+logging.info(f"Comparing RoBERTa backends on {len(sample)} posts from {json_file_path}.")
+compare_roberta_backends(sample, backends=tuple(args.backends))
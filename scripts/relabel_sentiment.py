@@ -0,0 +1,54 @@
+"""
+This script re-derives the sentiment labels of a table from the scores and class
+probabilities stored next to them, so new thresholds can be applied without running
+the models again. VADER labels are recomputed from the compound scores and RoBERTa
+labels from the negative, neutral and positive probabilities, both in a single SQL
+UPDATE per table.
+"""
+
+import argparse
+import sys
+import os
+
+# Add the project root directory to the Python path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from dotenv import load_dotenv
+from utils.database.connection import connect_to_database, close_connection_to_database
+from utils.database.update_data import relabel_vader_sentiment, relabel_roberta_sentiment
+from utils.general.table_utils import get_table_name_from_user
+from src.model_registry import SENTIMENT_MODEL, get_model_config
+from src.vader_analysis import VADER_POSITIVE_THRESHOLD, VADER_NEGATIVE_THRESHOLD
+import logging
+
+logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
+
+# Default to the thresholds the analysis stages label with
+MODEL_CONFIG = get_model_config(SENTIMENT_MODEL)
+
+parser = argparse.ArgumentParser(description="Re-derive the sentiment labels of a table from the stored scores.")
+parser.add_argument('--models', nargs='+', choices=['vader', 'roberta'], default=['vader', 'roberta'], help="The models whose labels to re-derive.")
+parser.add_argument('--vader-positive-threshold', type=float, default=VADER_POSITIVE_THRESHOLD, help="The minimum compound score labeled 'Positive'.")
+parser.add_argument('--vader-negative-threshold', type=float, default=VADER_NEGATIVE_THRESHOLD, help="The maximum compound score labeled 'Negative'.")
+parser.add_argument('--roberta-neutral-threshold', type=float, default=MODEL_CONFIG['neutral_threshold'], help=f"The RoBERTa threshold for neutral classification (default: the value registered for '{SENTIMENT_MODEL}').")
+parser.add_argument('--roberta-slight-threshold', type=float, default=MODEL_CONFIG['slight_threshold'], help=f"The RoBERTa threshold for slight classification (default: the value registered for '{SENTIMENT_MODEL}').")
+args = parser.parse_args()
+
+# loading variables from .env file
+load_dotenv()
+
+# Connect to database
+conn = connect_to_database()
+cursor = conn.cursor()
+
+table_name = get_table_name_from_user(cursor)
+if table_name is not None:
+    if 'vader' in args.models:
+        relabeled = relabel_vader_sentiment(cursor, table_name, args.vader_positive_threshold, args.vader_negative_threshold)
+        logging.info(f"Relabeled {relabeled} rows of {table_name}_sentiment_vader.")
+    if 'roberta' in args.models:
+        relabeled = relabel_roberta_sentiment(cursor, table_name, args.roberta_neutral_threshold, args.roberta_slight_threshold)
+        logging.info(f"Relabeled {relabeled} rows of {table_name}_sentiment_roberta.")
+
+# Closing the connection
+close_connection_to_database(conn, cursor)
@@ -1,20 +1,67 @@
-# Import normalization.py functions
-from .normalization import load_spacy_model, translate_text, tokenize_text, perform_ner, preprocess_text, create_id_to_index_mapping, process_entry, preprocess_data
+import importlib
 
-# Import sentiment_analysis.py functions
-from .vader_analysis import vader_analyze_sentiment, vader_label_sentiment, vader_analyze_batch
+# Names exported by each submodule. Submodules are imported on first access, so
+# importing src does not load spaCy, boto3, torch or cartopy up front.
+_exports = {
+    # normalization.py functions
+    'normalization': ['load_spacy_model', 'get_nlp', 'translate_text', 'clean_text', 'clean_texts', 'lemmatize_doc', 'tokenize_text', 'get_matcher', 'extract_entities', 'extract_entities_batch', 'perform_ner', 'preprocess_text', 'create_id_to_index_mapping', 'process_entry', 'parse_texts', 'resolve_language_codes', 'preprocess_data'],
 
-# Import geospatial_analysis.py function
-from .geospatial_analysis import is_within_us, process_geospatial_data, sentiment_to_color, plot_geospatial_data, analyze_geospatial
+    # preprocess_pool.py functions
+    'preprocess_pool': ['PreprocessWorkerPool', 'get_preprocess_pool', 'shutdown_preprocess_pool'],
 
-# Import roberta_process_data.py function
-from .roberta_process_data import create_dataframe, adjust_thresholds, roberta_analyze_data
+    # language_detection.py functions
+    'language_detection': ['get_language_identifier', 'detect_language', 'detect_languages'],
 
-# Import roberta_token.py function
-from .roberta_token import tokenize_data
+    # translation.py functions
+    'translation': ['TranslationError', 'TranslationBackend', 'AmazonTranslateBackend', 'StubTranslateBackend', 'get_translation_backend', 'translate_batch'],
 
-# Import sentiment_pipeline.py functions
-from .sentiment_pipeline import preprocess_and_store_data, vader_sentiment_analysis, roberta_sentiment_analysis, analyze_all_models, prompt_model_selection, perform_selected_sentiment_analysis
+    # sentiment_cache.py functions
+    'sentiment_cache': ['lookup_sentiment_results', 'store_sentiment_results'],
 
-# Import pipeline_helpers.py functions
-from .pipeline_helpers import initialize_and_fetch_data, fetch_and_store_table_data
\ No newline at end of file
+    # sentiment_analysis.py functions
+    'vader_analysis': ['VaderRuleSet', 'load_vader_rules', 'vader_analyze_sentiment', 'vader_label_sentiment', 'vader_label_scores', 'vader_score_texts', 'vader_score_parallel', 'vader_analyze_batch'],
+
+    # geospatial_analysis.py functions
+    'geospatial_analysis': ['is_within_us', 'process_geospatial_data', 'sentiment_to_color', 'plot_geospatial_data', 'analyze_geospatial'],
+
+    # roberta_process_data.py functions
+    'roberta_process_data': ['get_roberta_engine', 'create_dataframe', 'softmax', 'adjust_probability_thresholds', 'adjust_thresholds', 'class_probabilities', 'label_probabilities', 'postprocess_logits', 'predict_sentiment_classes', 'roberta_analyze_data', 'compare_roberta_backends', 'benchmark_sentiment_models'],
+
+    # model_registry.py functions
+    'model_registry': ['get_model_config'],
+
+    # roberta_engine.py classes
+    'roberta_engine': ['RobertaEngine', 'QuantizedRobertaEngine', 'OnnxRobertaEngine', 'create_roberta_engine', 'export_onnx_model', 'save_shared_weights', 'prepare_shared_model'],
+
+    # roberta_pool.py functions
+    'roberta_pool': ['RobertaWorkerPool', 'get_roberta_pool', 'shutdown_roberta_pool'],
+
+    # roberta_token.py functions
+    'roberta_token': ['tokenize_data', 'tokenize_batches'],
+
+    # sentiment_pipeline.py functions
+    'sentiment_pipeline': ['preprocess_and_store_data', 'vader_sentiment_analysis', 'roberta_sentiment_analysis', 'analyze_all_models', 'prompt_model_selection', 'perform_selected_sentiment_analysis'],
+
+    # pipeline_helpers.py functions
+    'pipeline_helpers': ['initialize_and_fetch_data', 'fetch_and_store_table_data'],
+}
+_name_to_module = {name: module for module, names in _exports.items() for name in names}
+
+__all__ = list(_name_to_module)
+
+def __getattr__(name):
+    """
+    Import the submodule that defines the requested name on first access.
+
+    @param name (str): The name of the attribute.
+    @ret (object): The requested function or class.
+
+    @raises AttributeError: If no submodule exports the name.
+    """
+    if name not in _name_to_module:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    module = importlib.import_module(f".{_name_to_module[name]}", __name__)
+    return getattr(module, name)
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
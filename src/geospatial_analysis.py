@@ -1,16 +1,25 @@
-from shapely.geometry import Point
-from pyproj import Transformer
-import matplotlib.pyplot as plt
-import cartopy.crs as ccrs  # coordinate reference system
-import cartopy.feature as cf
 import logging
 import warnings
+from utils.general.lazy_loading import lazy_load
 
 # Suppress specific download warnings
 warnings.filterwarnings("ignore", category=UserWarning, module="cartopy.io")
 
 logging.basicConfig(level=logging.INFO, format='[%(asctime)s] [%(levelname)s] %(message)s')
 
+@lazy_load("plotting stack")
+def load_plotting_stack():
+    """
+    Import matplotlib and cartopy on first use.
+
+    @param: None.
+    @ret (tuple): A tuple containing the matplotlib.pyplot, cartopy.crs and cartopy.feature modules.
+    """
+    import matplotlib.pyplot as plt
+    import cartopy.crs as ccrs  # coordinate reference system
+    import cartopy.feature as cf
+    return plt, ccrs, cf
+
 def is_within_us(longitude, latitude):
     """
     Check if the given longitude and latitude fall within the approximate bounds of the US.
@@ -26,25 +35,35 @@ def process_geospatial_data(geospatial_data, sentiment_results):
     Process geospatial data, filtering out US locations and transforming coordinates.
 
     @param geospatial_data (list of list): A list of lists formatted as [[id, longitude, latitude, location], ...].
-    @param sentiment_results (np.ndarray): A NumPy array with sentiment analysis results.
+    @param sentiment_results (np.ndarray): A NumPy array with sentiment analysis results, formatted as [[id, text, sentiment, ...], ...].
+        Results are matched to the geospatial data by ID.
     @ret: Two lists of tuples - 
         - Transformed coordinates (list of tuple): Transformed coordinates excluding US locations.
         - Original coordinates and sentiments (list of tuple): Original coordinates and sentiments excluding US locations.
     """
+    from shapely.geometry import Point
+    from pyproj import Transformer
+
     transformer = Transformer.from_crs("EPSG:4326", "EPSG:3857", always_xy=True)
 
     transformed_points = []
     original_points_and_sentiments = []
 
-    for i, data in enumerate(geospatial_data):
-        _, lon, lat, _ = data
+    # The geospatial data only holds some of the posts, so look up each post's sentiment by ID
+    id_to_sentiment = {str(result[0]): result[2] for result in sentiment_results}
+
+    for data in geospatial_data:
+        id_, lon, lat, _ = data
+        sentiment = id_to_sentiment.get(str(id_))
+        if sentiment is None:
+            continue
         try:
             lon, lat = float(lon), float(lat)
             if not is_within_us(lon, lat):
                 point = Point(lon, lat)
                 x, y = transformer.transform(point.x, point.y)
                 transformed_points.append((x, y))
-                original_points_and_sentiments.append((lon, lat, sentiment_results[i][2]))  # Include sentiment label
+                original_points_and_sentiments.append((lon, lat, sentiment))  # Include sentiment label
         except ValueError as e:
             logging.error(f"Invalid data point {data}: {e}")
             continue
@@ -74,6 +93,7 @@ def plot_geospatial_data(original_points_and_sentiments, model_name):
     @param model_name (str): The name of the sentiment analysis model.
     @ret: None.
     """
+    plt, ccrs, cf = load_plotting_stack()
     fig, ax = plt.subplots(1, 2, figsize=(15, 10), subplot_kw={'projection': ccrs.PlateCarree()})
 
     # Define colors and labels for the legend
@@ -0,0 +1,42 @@
+import os
+from utils.general.lazy_loading import lazy_load
+from utils.general.dedup import deduplicate
+
+# Detections below this probability are left for the translation service to auto-detect
+LANGUAGE_DETECTION_MIN_CONFIDENCE = float(os.getenv('LANGUAGE_DETECTION_MIN_CONFIDENCE', 0.8))
+
+@lazy_load("language identifier")
+def get_language_identifier():
+    """
+    Load the offline langid.py language identifier once, on first use.
+
+    @param: None.
+    @ret (langid.langid.LanguageIdentifier): The language identifier, returning normalized probabilities.
+    """
+    from langid.langid import LanguageIdentifier, model
+    return LanguageIdentifier.from_modelstring(model, norm_probs=True)
+
+def detect_language(text, min_confidence=LANGUAGE_DETECTION_MIN_CONFIDENCE):
+    """
+    Identify the language of a text locally, without calling any service.
+
+    @param text (str): The text to identify.
+    @param min_confidence (float): The minimum probability required to accept the detection.
+    @ret (str or None): The ISO 639-1 language code, or None if the text is empty or the detection is not confident.
+    """
+    if not text.strip():
+        return None
+    language_code, probability = get_language_identifier().classify(text)
+    return language_code if probability >= min_confidence else None
+
+def detect_languages(texts, min_confidence=LANGUAGE_DETECTION_MIN_CONFIDENCE):
+    """
+    Identify the language of many texts, classifying each unique text once.
+
+    @param texts (list of str): The texts to identify.
+    @param min_confidence (float): The minimum probability required to accept a detection.
+    @ret (list of str or None): The language code of each text, None where the detection is not confident.
+    """
+    unique_texts, inverse = deduplicate(texts, description="texts for language detection")
+    unique_codes = [detect_language(text, min_confidence) for text in unique_texts]
+    return [unique_codes[unique_index] for unique_index in inverse]
@@ -0,0 +1,70 @@
+import os
+
+# Transformer sentiment models by name. Each entry declares:
+#   model, tokenizer: the Hugging Face model and its tokenizer
+#   class_order: the output indices of the model's negative, neutral and positive classes (None for a model without a neutral class)
+#   neutral_threshold, slight_threshold: the thresholds of the five-way labels, unused without a neutral class
+#   batch_size, max_length: the number of texts per forward pass and the number of tokens texts are truncated to
+MODEL_REGISTRY = {
+    'roberta': {
+        'model': "cardiffnlp/twitter-roberta-base-sentiment",
+        'tokenizer': "cardiffnlp/twitter-roberta-base-sentiment",
+        'class_order': (0, 1, 2),
+        'neutral_threshold': 0.7,
+        'slight_threshold': 0.35,
+        'batch_size': 200,
+        'max_length': 512,
+    },
+    'roberta-latest': {
+        'model': "cardiffnlp/twitter-roberta-base-sentiment-latest",
+        'tokenizer': "cardiffnlp/twitter-roberta-base-sentiment-latest",
+        'class_order': (0, 1, 2),
+        'neutral_threshold': 0.7,
+        'slight_threshold': 0.35,
+        'batch_size': 200,
+        'max_length': 512,
+    },
+    'bertweet': {
+        'model': "finiteautomata/bertweet-base-sentiment-analysis",
+        'tokenizer': "finiteautomata/bertweet-base-sentiment-analysis",
+        'class_order': (0, 1, 2),
+        'neutral_threshold': 0.7,
+        'slight_threshold': 0.35,
+        'batch_size': 200,
+        'max_length': 128,
+    },
+    'distilbert-multilingual': {
+        'model': "lxyuan/distilbert-base-multilingual-cased-sentiments-student",
+        'tokenizer': "lxyuan/distilbert-base-multilingual-cased-sentiments-student",
+        'class_order': (2, 1, 0),
+        'neutral_threshold': 0.7,
+        'slight_threshold': 0.35,
+        'batch_size': 400,
+        'max_length': 512,
+    },
+    'distilbert-sst2': {
+        'model': "distilbert/distilbert-base-uncased-finetuned-sst-2-english",
+        'tokenizer': "distilbert/distilbert-base-uncased-finetuned-sst-2-english",
+        'class_order': (0, None, 1),
+        'neutral_threshold': None,
+        'slight_threshold': None,
+        'batch_size': 400,
+        'max_length': 512,
+    },
+}
+
+# The registered model run by the RoBERTa sentiment stage
+SENTIMENT_MODEL = os.getenv('SENTIMENT_MODEL', 'roberta')
+
+def get_model_config(name=SENTIMENT_MODEL):
+    """
+    Look up a registered sentiment model.
+
+    @param name (str): The name of the model in MODEL_REGISTRY.
+    @ret (dict): The model's registry entry, with its name under 'name'.
+
+    @raises ValueError: If the model is not registered.
+    """
+    if name not in MODEL_REGISTRY:
+        raise ValueError(f"Unknown sentiment model '{name}'. Choose from: {', '.join(MODEL_REGISTRY)}.")
+    return {'name': name, **MODEL_REGISTRY[name]}
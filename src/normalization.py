@@ -1,11 +1,12 @@
-import boto3
-import spacy
 import re # Regex library
 import logging
 import numpy as np
-import concurrent.futures
+import polars as pl
 from utils.general.language_codes import language_mapping
-from spacy.matcher import Matcher
+from utils.general.lazy_loading import lazy_load
+from utils.general.dedup import deduplicate
+from src.translation import translate_text, translate_batch
+from src.language_detection import detect_languages
 
 def load_spacy_model(model_name):
     """
@@ -16,46 +17,111 @@ def load_spacy_model(model_name):
     
     @raises RuntimeError: If the model cannot be loaded.
     """
+    import spacy
+
     try:
         return spacy.load(model_name)
     except IOError as e:
         logging.error(f"Error loading spaCy model: {e}")
         raise RuntimeError(f"Failed to load spaCy model '{model_name}'")
 
-# Load the spaCy model once
-nlp = load_spacy_model("en_core_web_lg")
+SPACY_MODEL = "en_core_web_lg"
+
+@lazy_load("spaCy model")
+def get_nlp():
+    """
+    Load the spaCy model once, on first use.
+
+    @param: None.
+    @ret (spacy.language.Language): The loaded spaCy model.
+    """
+    return load_spacy_model(SPACY_MODEL)
+
+# Patterns removed by clean_text: mentions, hashtags, URLs and emails
+MENTION_PATTERN = re.compile(r'@\w+')
+HASHTAG_PATTERN = re.compile(r'#\w+')
+URL_PATTERN = re.compile(r'http\S+|www\S+|\S+\.\S+', flags=re.IGNORECASE)
+EMAIL_PATTERN = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+
+# The same patterns for the Polars regex engine used by clean_texts. Python's \w, \s and \S
+# are spelled out because the Rust engine classifies some Unicode characters differently.
+COLUMN_CLEANING_PATTERNS = [
+    r'@[\p{L}\p{N}_]+',
+    r'#[\p{L}\p{N}_]+',
+    r'(?i)http[^\s\x1c-\x1f]+|www[^\s\x1c-\x1f]+|[^\s\x1c-\x1f]+\.[^\s\x1c-\x1f]+',
+    r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b',
+]
+COLUMN_WHITESPACE_PATTERN = r'[\s\x1c-\x1f]+'
+
+# Custom entity patterns found by the Matcher, by label
+CUSTOM_ENTITY_PATTERNS = {
+    # Match "minister of justice" in any case
+    "MinisterOfJustice": [[
+        {"LOWER": "minister"},
+        {"IS_SPACE": True, "OP": "*"},
+        {"LOWER": "of", "OP": "?"},
+        {"IS_SPACE": True, "OP": "*"},
+        {"LOWER": "justice"}
+    ]],
+}
 
-# Initialize the Amazon Translate client
-translate_client = boto3.client('translate', region_name='us-east-1')
+# Default batching for spaCy's nlp.pipe
+SPACY_BATCH_SIZE = 1000
 
-# Initialize translation cache and preprocess cache
-translation_cache = {}
-preprocess_cache = {}
+# Stop words that carry sentiment for VADER and must survive stop word removal
+IMPORTANT_STOP_WORDS_FOR_VADER = frozenset([
+    'really', 'some', 'almost', 'quite', 'rather', 'because', 'never',
+    'always', 'could', 'enough', 'might', 'without', 'have', 'also', 'can',
+    'should', 'not', 'only', 'more', 'whatever', 'beside', 'although',
+    'however', 'yet', 'still', 'while', 'but', 'despite', 'nowhere',
+    'otherwise', 'nevertheless', 'therefore', 'moreover', 'serious', 'nothing',
+    'another', 'mostly', 'except', 'hence', 'cannot', 'last', 'than', 'barely',
+    'hardly', 'just', 'little', 'merely', 'nearly', 'scarcely', 'simply',
+    'solely', 'very'
+])
 
-def translate_text(text, language):
+def clean_text(text):
     """
-    Translate text to English using Amazon Translate.
-    
-    @param text (str): The text to translate.
-    @param language (str): The source language code.
-    @ret (str): The translated text.
+    Clean the text by removing mentions, hashtags, URLs, emails, and extra spaces.
+
+    @param text (str): The text to clean.
+    @ret (str): The cleaned text.
     """
-    # Check if the text and language pair is already in the cache
-    if (text, language) in translation_cache:
-        return translation_cache[(text, language)]
-    
-    try:
-        response = translate_client.translate_text(
-            Text=text,
-            SourceLanguageCode=language if language is not None else 'auto',
-            TargetLanguageCode='en'
-        )
-        # Store the translated text in the cache
-        translation = response['TranslatedText']
-        translation_cache[(text, language)] = translation
-        return translation
-    except Exception as e:
-        return text  # If translation fails, use original text
+    # Remove user tags or mentions
+    text = MENTION_PATTERN.sub('', text)
+    # Remove hashtags
+    text = HASHTAG_PATTERN.sub('', text)
+    # Remove URLs
+    text = URL_PATTERN.sub('', text)
+    # Remove Emails
+    text = EMAIL_PATTERN.sub('', text)
+    # Remove extra spaces
+    return ' '.join(text.split())
+
+def clean_texts(texts):
+    """
+    Clean a whole column of texts at once. Gives the same results as calling
+    clean_text on every text, but runs each pattern over the column in Polars.
+
+    @param texts (list of str or np.ndarray): The texts to clean.
+    @ret (list of str): The cleaned texts, in input order.
+    """
+    column = pl.Series(list(texts), dtype=pl.Utf8).fill_null('')
+    for pattern in COLUMN_CLEANING_PATTERNS:
+        column = column.str.replace_all(pattern, '')
+    # Collapse whitespace runs into single spaces, like ' '.join(text.split())
+    column = column.str.replace_all(COLUMN_WHITESPACE_PATTERN, ' ').str.strip_chars(' ')
+    return column.to_list()
+
+def lemmatize_doc(doc):
+    """
+    Lemmatize a parsed spaCy document, dropping stop words that are not negations
+    and the stop words VADER relies on.
+
+    @param doc (spacy.tokens.Doc): The parsed document.
+    @ret (list of str): A list of lemmatized tokens.
+    """
+    return [token.lemma_ for token in doc if (not token.is_stop or token.dep_ == 'neg') and (token.text.lower() not in IMPORTANT_STOP_WORDS_FOR_VADER)]
 
 def tokenize_text(text, language):
     """
@@ -66,61 +132,54 @@ def tokenize_text(text, language):
     @param language (str): The language code for translation.
     @ret (list of str): A list of tokens.
     """
-    # Remove user tags or mentions
-    text = re.sub(r'@\w+', '', text)
-    # Remove hashtags
-    text = re.sub(r'#\w+', '', text)
-    # Remove URLs
-    text = re.sub(r'http\S+|www\S+|\S+\.\S+', '', text, flags=re.IGNORECASE)
-    # Remove Emails
-    text = re.sub(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', '', text)
-    # Remove extra spaces
-    text = ' '.join(text.split())
-
-    translated_text = translate_text(text, language)
-    doc = nlp(translated_text)
-
-    important_stop_words_for_vader = [
-        'really', 'some', 'almost', 'quite', 'rather', 'because', 'never',
-        'always', 'could', 'enough', 'might', 'without', 'have', 'also', 'can',
-        'should', 'not', 'only', 'more', 'whatever', 'beside', 'although',
-        'however', 'yet', 'still', 'while', 'but', 'despite', 'nowhere',
-        'otherwise', 'nevertheless', 'therefore', 'moreover', 'serious', 'nothing',
-        'another', 'mostly', 'except', 'hence', 'cannot', 'last', 'than', 'barely',
-        'hardly', 'just', 'little', 'merely', 'nearly', 'scarcely', 'simply',
-        'solely', 'very'
-    ]
-    # Create list of lemmatized tokens
-    return [token.lemma_ for token in doc if (not token.is_stop or token.dep_ == 'neg') and (token.text.lower() not in important_stop_words_for_vader)]
+    translated_text = translate_text(clean_text(text), language)
+    return lemmatize_doc(get_nlp()(translated_text))
+
+@lazy_load("spaCy matcher")
+def get_matcher():
+    """
+    Build the Matcher for the custom entity patterns once, on first use.
+
+    @param: None.
+    @ret (spacy.matcher.Matcher): The compiled Matcher.
+    """
+    from spacy.matcher import Matcher
+
+    matcher = Matcher(get_nlp().vocab)
+    for label, patterns in CUSTOM_ENTITY_PATTERNS.items():
+        matcher.add(label, patterns)
+    return matcher
+
+def extract_entities(doc):
+    """
+    Extract the named entities and custom pattern matches from a parsed document.
+
+    @param doc (spacy.tokens.Doc): The parsed document.
+    @ret (list of tuples): A list of (text, label, start_char, end_char) tuples.
+    """
+    entities = [(ent.text, ent.label_, ent.start_char, ent.end_char) for ent in doc.ents]
+    matches = {(span.text, span.label_, span.start_char, span.end_char) for span in get_matcher()(doc, as_spans=True)}
+    return entities + sorted(matches, key=lambda match: match[2])
+
+def extract_entities_batch(texts, batch_size=SPACY_BATCH_SIZE):
+    """
+    Extract named entities and custom pattern matches from many texts, parsing them in batches.
+
+    @param texts (list of str): The texts to analyze.
+    @param batch_size (int): The number of texts spaCy processes per batch.
+    @ret (list of lists): For each text, a list of (text, label, start_char, end_char) tuples.
+    """
+    return [extract_entities(doc) for doc in get_nlp().pipe(texts, batch_size=batch_size)]
 
 def perform_ner(text):
     """
     Perform Named Entity Recognition (NER) on the text and identify specific patterns.
 
     @param text (str): The text to analyze.
-    @ret (list of tuples): A list of tuples containing named entities and their labels.
+    @ret (list of tuples): A list of tuples containing named entities and custom pattern matches with their labels.
     """
-    doc = nlp(text)
-    
-    # Initialize the Matcher
-    matcher = Matcher(nlp.vocab)
-    
-    # Define pattern to match "minister of justice" in any case
-    pattern = [
-        {"LOWER": "minister"},
-        {"IS_SPACE": True, "OP": "*"},
-        {"LOWER": "of", "OP": "?"},
-        {"IS_SPACE": True, "OP": "*"},
-        {"LOWER": "justice"}
-    ]
-    
-    matcher.add("MinisterOfJustice", [pattern])
-    
-    # Find matches in the doc
-    matches = matcher(doc)
-    named_entities = [(ent.text, ent.label_) for ent in doc.ents]
-    
-    return named_entities
+    doc = get_nlp()(text)
+    return [(entity_text, label) for entity_text, label, _, _ in extract_entities(doc)]
 
 def preprocess_text(text, language):
     """
@@ -163,42 +222,110 @@ def process_entry(entry, id_to_index, language_data):
     preprocessed_text = preprocess_text(text, language_code)
     return id_, preprocessed_text
 
-def preprocess_data(data, language_data):
+def parse_texts(texts, batch_size=SPACY_BATCH_SIZE, return_entities=False):
     """
-    Preprocess a list of data items using parallel processing.
-    
+    Lemmatize translated texts with spaCy's nlp.pipe, optionally extracting named entities from the same parse.
+
+    @param texts (list of str): The translated texts to parse.
+    @param batch_size (int): The number of texts spaCy processes per batch.
+    @param return_entities (bool): Whether to also extract named entities.
+    @ret (tuple): A tuple containing:
+        - (list of str): The lemmatized text of each input, in input order.
+        - (list of lists): The entities of each input, empty unless return_entities is set.
+    """
+    preprocessed_texts, entities = [], []
+    for doc in get_nlp().pipe(texts, batch_size=batch_size):
+        preprocessed_texts.append(" ".join(lemmatize_doc(doc)))
+        if return_entities:
+            entities.append(extract_entities(doc))
+    return preprocessed_texts, entities
+
+def resolve_language_codes(data, language_data):
+    """
+    Resolve the translation source language of every entry. Stored language names are
+    mapped to their codes; entries with a missing or unknown language are identified
+    locally from their cleaned text.
+
     @param data (np.ndarray): A NumPy array of [id, text] pairs.
     @param language_data (np.ndarray): A NumPy array of [id, language] pairs.
-    @ret (np.ndarray): A NumPy array of unique [id, preprocessed_text] pairs.
+    @ret (list of str or None): The language code of each entry, None where it could not be determined.
     """
-    unique_preprocessed_texts = set()
-    preprocessed_data = []
+    id_to_index = create_id_to_index_mapping(language_data)
+
+    language_codes, undetermined_positions = [], []
+    for position, (id_, _) in enumerate(data):
+        index = id_to_index.get(id_)
+        language_code = language_mapping.get(language_data[int(index), 1]) if index is not None else None
+        if language_code is None:
+            undetermined_positions.append(position)
+        language_codes.append(language_code)
+
+    if undetermined_positions:
+        cleaned_texts = clean_texts(data[undetermined_positions, 1])
+        for position, language_code in zip(undetermined_positions, detect_languages(cleaned_texts)):
+            language_codes[position] = language_code
+        logging.info(f"Identified the language of {len(undetermined_positions)} entries without a known language locally.")
 
+    return language_codes
+
+def preprocess_data(data, language_data, batch_size=SPACY_BATCH_SIZE, n_process=None, return_entities=False, language_codes=None):
+    """
+    Preprocess a list of data items by cleaning and translating each text, then
+    streaming the translated texts through spaCy's nlp.pipe in batches, spread over
+    the persistent preprocessing worker pool. Identical (cleaned text, language)
+    inputs are processed once and shared by every ID.
+    
+    @param data (np.ndarray): A NumPy array of [id, text] pairs.
+    @param language_data (np.ndarray): A NumPy array of [id, language] pairs.
+    @param batch_size (int): The number of texts spaCy processes per batch.
+    @param n_process (int): The number of worker processes. Defaults to PREPROCESS_WORKERS; 1 parses in this process.
+    @param return_entities (bool): Whether to also extract named entities from the same parse.
+    @param language_codes (list of str): The language code of each entry, as returned by
+        resolve_language_codes. Resolved from language_data if not given.
+    @ret (np.ndarray): A NumPy array of [id, preprocessed_text] pairs.
+    @ret (list of lists): Only if return_entities is set, a list of [id, entity, label, start_char, end_char]
+        entries, with character offsets into the translated text.
+    """
     # Convert to NumPy array if not already
     if not isinstance(data, np.ndarray):
         data = np.array(data)
     if not isinstance(language_data, np.ndarray):
         language_data = np.array(language_data)
+    if len(data) == 0:
+        return (data, []) if return_entities else data
 
-    # Create mapping from IDs to indices in language_data
-    id_to_index = create_id_to_index_mapping(language_data)
+    if language_codes is None:
+        language_codes = resolve_language_codes(data, language_data)
+
+    # Clean the whole content column before translation and parsing
+    cleaned_texts = clean_texts(data[:, 1])
+
+    # Process each unique (text, language) input once
+    unique_inputs, inverse = deduplicate(zip(cleaned_texts, language_codes), description="preprocessing inputs")
+    texts = [text for text, _ in unique_inputs]
+    language_codes = [language_code for _, language_code in unique_inputs]
+
+    # Translate grouped by source language with bounded concurrency
+    translated_texts = translate_batch(texts, language_codes)
+
+    # Stream the translated texts through spaCy in batches, extracting entities from the same parse
+    from src.preprocess_pool import PREPROCESS_WORKERS, get_preprocess_pool
+    n_process = PREPROCESS_WORKERS if n_process is None else n_process
+    if n_process > 1 and len(translated_texts) > batch_size:
+        pool = get_preprocess_pool(n_process, batch_size, return_entities)
+        unique_preprocessed_texts, unique_entities = pool.parse(translated_texts)
+        pool.log_memory_report()
+    else:
+        unique_preprocessed_texts, unique_entities = parse_texts(translated_texts, batch_size, return_entities)
+
+    # Fan the results back out to every ID
+    inverse = np.asarray(inverse, dtype=np.intp)
+    preprocessed_column = np.array(unique_preprocessed_texts, dtype=object)[inverse].astype(str)
+    preprocessed_data = np.column_stack((data[:, 0], preprocessed_column))
 
-    # Use ProcessPoolExecutor for parallel processing
-    with concurrent.futures.ProcessPoolExecutor() as executor:
-        # Submit tasks to the executor, where each task is to process an entry
-        future_to_entry = {executor.submit(process_entry, entry, id_to_index, language_data): entry for entry in data}
-        
-        # Iterate over Future objects as they complete and process the result
-        for future in concurrent.futures.as_completed(future_to_entry):
-            # Retrieve result of the completed task
-            id_, preprocessed_text = future.result()
-
-            # Ensure each processed text is unique before adding it to the result
-            if preprocessed_text not in unique_preprocessed_texts:
-                unique_preprocessed_texts.add(preprocessed_text)
-                preprocess_cache[preprocessed_text] = preprocessed_text
-                preprocessed_data.append([id_, preprocessed_text])
-            else:
-                preprocessed_data.append([id_, preprocess_cache[preprocessed_text]])
-
-    return np.array(preprocessed_data)
\ No newline at end of file
+    if not return_entities:
+        return preprocessed_data
+    entity_data = []
+    for id_, unique_index in zip(data[:, 0], inverse):
+        entity_data.extend([id_, *entity] for entity in unique_entities[unique_index])
+    return preprocessed_data, entity_data
\ No newline at end of file
@@ -1,9 +1,9 @@
+import numpy as np
 from utils.database import (
     initialize_database,
     create_database_tables,
-    fetch_content_data,
-    fetch_language_data,
-    fetch_geospatial_data,
+    stream_table_frames,
+    split_table_frame,
     insert_content_data,
 )
 from utils.database.insert_data import insert_language_data, insert_geospatial_data
@@ -37,6 +37,9 @@ def initialize_and_fetch_data():
 def fetch_and_store_table_data(cursor, table_name):
     """
     Fetch data from the specified table and store it in the appropriate tables.
+    The content, language and geospatial columns are read in a single scan, streamed
+    in chunks, and each chunk's child tables are stored as soon as it arrives. Only the
+    derived arrays of each chunk are kept, not the chunk itself.
     
     @param cursor (object): The database cursor.
     @param table_name (str): The name of the table to fetch data from.
@@ -46,17 +49,20 @@ def fetch_and_store_table_data(cursor, table_name):
         - geospatial_data (np.ndarray): Fetched geospatial data.
     """
     try:
-        # Fetch data from the specified table
-        data = fetch_content_data(cursor, table_name)
-        language_data = fetch_language_data(cursor, table_name)
-        
-        # Insert fetched data into the respective tables
-        insert_language_data(cursor, language_data, table_name)
-        insert_content_data(cursor, data, table_name)
-        
-        # Fetch and insert geospatial data
-        geospatial_data = fetch_geospatial_data(cursor, table_name)
-        insert_geospatial_data(cursor, geospatial_data, table_name)
+        # Fetch data from the specified table and insert it into the respective tables, chunk by chunk
+        content_chunks, language_chunks, geospatial_chunks = [], [], []
+        for frame in stream_table_frames(cursor, table_name):
+            content_chunk, language_chunk, geospatial_chunk = split_table_frame(frame)
+            insert_language_data(cursor, language_chunk, table_name)
+            insert_content_data(cursor, content_chunk, table_name)
+            insert_geospatial_data(cursor, geospatial_chunk, table_name)
+            content_chunks.append(content_chunk)
+            language_chunks.append(language_chunk)
+            geospatial_chunks.append(geospatial_chunk)
+
+        data = np.concatenate(content_chunks) if content_chunks else np.empty((0, 2), dtype=object)
+        language_data = np.concatenate(language_chunks) if language_chunks else np.empty((0, 2), dtype=object)
+        geospatial_data = np.concatenate(geospatial_chunks) if geospatial_chunks else np.empty((0, 4), dtype=object)
     
     except Exception as e:
         logging.error(f"An error occurred while fetching and inserting data: {e}")
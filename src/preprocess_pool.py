@@ -0,0 +1,104 @@
+import os
+import sys
+import math
+import multiprocessing
+from utils.general.worker_pool import PersistentWorkerPool, get_shared_pool, shutdown_shared_pool
+from src.normalization import get_nlp, get_matcher, parse_texts
+
+# Number of preprocessing worker processes, and the number of contiguous chunks each worker receives per call
+PREPROCESS_WORKERS = int(os.getenv('PREPROCESS_WORKERS', os.cpu_count() or 1))
+PREPROCESS_CHUNKS_PER_WORKER = 4
+
+# Parsing settings of this worker, set once by the pool initializer instead of sent with every task
+worker_settings = {}
+
+def initialize_worker(batch_size, return_entities):
+    """
+    Pool initializer: store the parsing settings and load the spaCy model and Matcher
+    once per worker. Workers forked from a parent that already loaded them inherit
+    both and skip the load.
+
+    @param batch_size (int): The number of texts spaCy processes per batch.
+    @param return_entities (bool): Whether to also extract named entities.
+    @ret: None.
+    """
+    worker_settings.update(batch_size=batch_size, return_entities=return_entities)
+    get_nlp()
+    get_matcher()
+
+def parse_chunk(texts):
+    """
+    Parse a contiguous chunk of texts with the settings given to the worker.
+
+    @param texts (list of str): The translated texts to parse.
+    @ret (tuple): The lemmatized texts and entities of the chunk, as returned by parse_texts.
+    """
+    return parse_texts(texts, **worker_settings)
+
+class PreprocessWorkerPool(PersistentWorkerPool):
+    """
+    A persistent pool of preprocessing workers that each hold the spaCy model,
+    reusable across tables.
+
+    On Linux the model is loaded in the parent first and the workers are forked, so
+    they share its memory copy-on-write instead of loading their own copy. Elsewhere
+    the workers are spawned, as forking a parent that already ran threads is unsafe
+    there, and each loads the model in the initializer.
+    """
+    name = 'preprocessing'
+    shared_memory = 'shared copy-on-write pages'
+
+    def __init__(self, workers=PREPROCESS_WORKERS, batch_size=1000, return_entities=False):
+        """
+        @param workers (int): The number of worker processes.
+        @param batch_size (int): The number of texts spaCy processes per batch.
+        @param return_entities (bool): Whether the workers also extract named entities.
+        """
+        if sys.platform.startswith('linux'):
+            get_nlp()
+            get_matcher()
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context('spawn')
+        super().__init__(workers, context, initialize_worker, (batch_size, return_entities))
+
+    def parse(self, texts):
+        """
+        Lemmatize texts across the workers. Each worker receives a few large contiguous
+        chunks and returns the results of a whole chunk at once.
+
+        @param texts (list of str): The translated texts to parse.
+        @ret (tuple): A tuple containing:
+            - (list of str): The lemmatized text of each input, in input order.
+            - (list of lists): The entities of each input, empty unless the pool extracts entities.
+        """
+        chunk_size = max(1, math.ceil(len(texts) / (self.workers * PREPROCESS_CHUNKS_PER_WORKER)))
+        chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+
+        preprocessed_texts, entities = [], []
+        for chunk_texts, chunk_entities in self.executor.map(parse_chunk, chunks):
+            preprocessed_texts.extend(chunk_texts)
+            entities.extend(chunk_entities)
+        return preprocessed_texts, entities
+
+def get_preprocess_pool(workers=PREPROCESS_WORKERS, batch_size=1000, return_entities=False):
+    """
+    Return the shared preprocessing worker pool, starting it on first use or when
+    a different size or different settings are requested.
+
+    @param workers (int): The number of worker processes.
+    @param batch_size (int): The number of texts spaCy processes per batch.
+    @param return_entities (bool): Whether the workers also extract named entities.
+    @ret (PreprocessWorkerPool): The worker pool.
+    """
+    settings = (workers, batch_size, return_entities)
+    return get_shared_pool('preprocess', settings, lambda: PreprocessWorkerPool(*settings))
+
+def shutdown_preprocess_pool():
+    """
+    Stop the shared preprocessing worker pool, if it was started.
+
+    @param: None.
+    @ret: None.
+    """
+    shutdown_shared_pool('preprocess')
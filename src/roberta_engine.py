@@ -0,0 +1,221 @@
+import os
+import time
+import logging
+import torch
+from transformers import AutoConfig, AutoModelForSequenceClassification, AutoTokenizer
+
+# The inference backend used by the pipeline: 'pytorch', 'int8' or 'onnx'
+ROBERTA_BACKEND = os.getenv('ROBERTA_BACKEND', 'pytorch')
+
+# Directories where exported ONNX models and shared weight files are kept between runs
+MODELS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'models'))
+ROBERTA_ONNX_DIR = os.getenv('ROBERTA_ONNX_DIR', os.path.join(MODELS_DIR, 'onnx'))
+ROBERTA_WEIGHTS_DIR = os.getenv('ROBERTA_WEIGHTS_DIR', os.path.join(MODELS_DIR, 'weights'))
+
+class RobertaEngine:
+    """
+    Inference engine for RoBERTa and the other registered transformer models, running
+    the fp32 PyTorch model. Loads the tokenizer and
+    model once, in eval mode, and reuses them for every batch, table and model
+    comparison in the process. Other backends override load_model and run.
+    """
+    name = 'pytorch'
+
+    def __init__(self, config, weights_path=None):
+        """
+        Load the tokenizer and model.
+
+        @param config (dict): The model's entry in the model registry, see get_model_config.
+        @param weights_path (str): Optional state dict saved by save_shared_weights. Its tensors are
+            memory-mapped, so processes loading the same file share one copy of the weights.
+        """
+        start_time = time.perf_counter()
+        self.config = config
+        self.model_name = config['model']
+        self.weights_path = weights_path
+        self.tokenizer = AutoTokenizer.from_pretrained(config['tokenizer'], use_fast=True)
+        self.model = self.load_model()
+        self.load_seconds = time.perf_counter() - start_time
+
+        self.batches = 0
+        self.rows = 0
+        self.inference_seconds = 0.0
+        self.batch_seconds = []
+
+    def load_model(self):
+        """
+        Load the model in eval mode.
+
+        @param: None.
+        @ret (object): The model.
+        """
+        if self.weights_path is None:
+            model = AutoModelForSequenceClassification.from_pretrained(self.model_name)
+        else:
+            # The randomly initialized parameters are replaced by the memory-mapped tensors, not copied into
+            model = AutoModelForSequenceClassification.from_config(AutoConfig.from_pretrained(self.model_name))
+            model.load_state_dict(torch.load(self.weights_path, mmap=True, weights_only=True), assign=True)
+        model.eval()
+        return model
+
+    def run(self, input_ids, attention_masks):
+        """
+        Run the model on one tokenized batch.
+
+        @param input_ids (torch.Tensor): The token IDs of the batch.
+        @param attention_masks (torch.Tensor): The attention masks of the batch.
+        @ret (torch.Tensor or np.ndarray): The model logits, one row per text.
+        """
+        with torch.inference_mode():
+            return self.model(input_ids, attention_mask=attention_masks).logits
+
+    def predict_logits(self, input_ids, attention_masks):
+        """
+        Run the model on one tokenized batch.
+
+        @param input_ids (torch.Tensor): The token IDs of the batch.
+        @param attention_masks (torch.Tensor): The attention masks of the batch.
+        @ret (torch.Tensor or np.ndarray): The model logits, one row per text.
+        """
+        start_time = time.perf_counter()
+        logits = self.run(input_ids, attention_masks)
+        elapsed = time.perf_counter() - start_time
+
+        self.batches += 1
+        self.rows += len(input_ids)
+        self.inference_seconds += elapsed
+        self.batch_seconds.append(elapsed)
+        logging.debug(f"RoBERTa batch {self.batches}: {len(input_ids)} texts in {elapsed:.3f} seconds.")
+        return logits
+
+    def log_inference_report(self):
+        """
+        Log the model load time and the inference time of all batches so far.
+
+        @param: None.
+        @ret: None.
+        """
+        throughput = self.rows / self.inference_seconds if self.inference_seconds else 0.0
+        logging.info(
+            f"{self.config['name']} [{self.name}]: model loaded in {self.load_seconds:.2f} seconds; {self.rows} texts in {self.batches} batches "
+            f"inferred in {self.inference_seconds:.2f} seconds ({throughput:.1f} texts/s)."
+        )
+
+class QuantizedRobertaEngine(RobertaEngine):
+    """
+    RoBERTa inference engine running the PyTorch model with its linear layers
+    dynamically quantized to int8.
+
+    Quantizing copies the linear weights into packed int8 tensors, so worker
+    processes share only the embeddings and other unquantized weights of the
+    memory-mapped file; each worker holds its own int8 copy of the linear layers.
+    """
+    name = 'int8'
+
+    def load_model(self):
+        model = super().load_model()
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+class OnnxRobertaEngine(RobertaEngine):
+    """
+    RoBERTa inference engine running the model exported to ONNX with ONNX Runtime.
+    The model is exported to ROBERTA_ONNX_DIR on first use.
+    """
+    name = 'onnx'
+
+    def load_model(self):
+        import onnxruntime
+
+        onnx_path = export_onnx_model(self.config)
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = torch.get_num_threads()
+        return onnxruntime.InferenceSession(onnx_path, sess_options=options, providers=['CPUExecutionProvider'])
+
+    def run(self, input_ids, attention_masks):
+        inputs = {'input_ids': input_ids.numpy(), 'attention_mask': attention_masks.numpy()}
+        return self.model.run(['logits'], inputs)[0]
+
+# Available inference backends by name
+ROBERTA_ENGINES = {
+    RobertaEngine.name: RobertaEngine,
+    QuantizedRobertaEngine.name: QuantizedRobertaEngine,
+    OnnxRobertaEngine.name: OnnxRobertaEngine,
+}
+
+def create_roberta_engine(config, backend=ROBERTA_BACKEND, weights_path=None):
+    """
+    Create a RoBERTa inference engine by backend name.
+
+    @param config (dict): The model's entry in the model registry, see get_model_config.
+    @param backend (str): The name of the backend ('pytorch', 'int8' or 'onnx').
+    @param weights_path (str): Optional memory-mapped state dict to load the PyTorch weights from.
+    @ret (RobertaEngine): The inference engine.
+
+    @raises ValueError: If the backend name is unknown.
+    """
+    if backend not in ROBERTA_ENGINES:
+        raise ValueError(f"Unknown RoBERTa backend '{backend}'. Choose from: {', '.join(ROBERTA_ENGINES)}.")
+    return ROBERTA_ENGINES[backend](config, weights_path=weights_path)
+
+def save_shared_weights(model_name, weights_dir=ROBERTA_WEIGHTS_DIR):
+    """
+    Save the model's state dict once, so worker processes can memory-map the same file.
+
+    @param model_name (str): The name of the Hugging Face model.
+    @param weights_dir (str): The directory of the weight files.
+    @ret (str): The path of the weight file.
+    """
+    weights_path = os.path.join(weights_dir, f"{model_name.replace('/', '--')}.pt")
+    if not os.path.exists(weights_path):
+        logging.info(f"Saving RoBERTa weights of '{model_name}' to {weights_path}.")
+        os.makedirs(weights_dir, exist_ok=True)
+        model = AutoModelForSequenceClassification.from_pretrained(model_name)
+        temporary_path = f"{weights_path}.{os.getpid()}.tmp"
+        torch.save(model.state_dict(), temporary_path)
+        os.replace(temporary_path, weights_path)
+    return weights_path
+
+def export_onnx_model(config, onnx_dir=ROBERTA_ONNX_DIR):
+    """
+    Export the model to ONNX once, with dynamic batch and sequence dimensions.
+
+    @param config (dict): The model's entry in the model registry, see get_model_config.
+    @param onnx_dir (str): The directory of the ONNX files.
+    @ret (str): The path of the ONNX file.
+    """
+    model_name = config['model']
+    onnx_path = os.path.join(onnx_dir, f"{model_name.replace('/', '--')}.onnx")
+    if os.path.exists(onnx_path):
+        return onnx_path
+
+    logging.info(f"Exporting RoBERTa model '{model_name}' to {onnx_path}.")
+    os.makedirs(onnx_dir, exist_ok=True)
+    model = AutoModelForSequenceClassification.from_pretrained(model_name, torchscript=True)
+    model.eval()
+    sample = AutoTokenizer.from_pretrained(config['tokenizer'], use_fast=True)(["Exporting the model."], return_tensors='pt')
+    dynamic_axes = {'input_ids': {0: 'batch', 1: 'sequence'}, 'attention_mask': {0: 'batch', 1: 'sequence'}, 'logits': {0: 'batch'}}
+
+    # Tracing fails on inference tensors, so export under no_grad rather than inference_mode
+    temporary_path = f"{onnx_path}.{os.getpid()}.tmp"
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (sample['input_ids'], sample['attention_mask']), temporary_path,
+            input_names=['input_ids', 'attention_mask'], output_names=['logits'],
+            dynamic_axes=dynamic_axes, opset_version=14
+        )
+    os.replace(temporary_path, onnx_path)
+    return onnx_path
+
+def prepare_shared_model(config, backend=ROBERTA_BACKEND):
+    """
+    Write the file worker processes load the model from, once, before they start:
+    the ONNX export for the ONNX backend, the memory-mappable state dict otherwise.
+
+    @param config (dict): The model's entry in the model registry, see get_model_config.
+    @param backend (str): The name of the backend ('pytorch', 'int8' or 'onnx').
+    @ret (str or None): The weight file to pass to create_roberta_engine, None for the ONNX backend.
+    """
+    if backend == OnnxRobertaEngine.name:
+        export_onnx_model(config)
+        return None
+    return save_shared_weights(config['model'])
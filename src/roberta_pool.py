@@ -0,0 +1,139 @@
+import os
+import time
+import logging
+import collections
+import multiprocessing
+from utils.general.prefetch import prefetch
+from utils.general.worker_pool import PersistentWorkerPool, get_shared_pool, shutdown_shared_pool
+
+# torch and the model are imported inside the functions, so importing the pool does not load them
+
+# Number of RoBERTa worker processes (1 runs inference in this process) and the torch threads each one uses.
+# Tune the two together so workers x threads matches the cores of the node.
+ROBERTA_WORKERS = max(1, int(os.getenv('ROBERTA_WORKERS', 1)))
+ROBERTA_THREADS_PER_WORKER = int(os.getenv('ROBERTA_THREADS_PER_WORKER', max(1, (os.cpu_count() or 1) // ROBERTA_WORKERS)))
+
+# Inference engine of this worker, created once by the pool initializer
+worker_state = {}
+
+def initialize_worker(model_key, backend, weights_path, threads):
+    """
+    Pool initializer: limit torch to the worker's share of the cores and load the
+    model from the shared memory-mapped weight file.
+
+    @param model_key (str): The name of the model in the model registry.
+    @param backend (str): The name of the inference backend.
+    @param weights_path (str): The weight file saved by prepare_shared_model, None for the ONNX backend.
+    @param threads (int): The number of intra-op threads of the worker.
+    @ret: None.
+    """
+    import torch
+    from src.model_registry import get_model_config
+    from src.roberta_engine import create_roberta_engine
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    worker_state['engine'] = create_roberta_engine(get_model_config(model_key), backend, weights_path=weights_path)
+
+def predict_batch(input_ids, attention_masks):
+    """
+    Run one tokenized batch through the worker's model.
+
+    @param input_ids (torch.Tensor): The token IDs of the batch.
+    @param attention_masks (torch.Tensor): The attention masks of the batch.
+    @ret (tuple): The adjusted predictions and the class probabilities of the batch, as returned by postprocess_logits.
+    """
+    from src.roberta_process_data import postprocess_logits
+
+    engine = worker_state['engine']
+    return postprocess_logits(engine.predict_logits(input_ids, attention_masks), engine.config)
+
+class RobertaWorkerPool(PersistentWorkerPool):
+    """
+    A persistent pool of RoBERTa inference workers, reusable across tables.
+
+    The parent tokenizes and buckets the texts; the workers pull tokenized batches
+    from the pool's task queue and each runs them on its own model, whose weights are
+    memory-mapped from one file shared by all workers (or, for the ONNX backend,
+    loaded from one exported model).
+    """
+    name = 'RoBERTa'
+    shared_memory = 'shared memory-mapped weights'
+
+    def __init__(self, model_key, backend, workers=ROBERTA_WORKERS, threads=ROBERTA_THREADS_PER_WORKER):
+        """
+        @param model_key (str): The name of the model in the model registry.
+        @param backend (str): The name of the inference backend.
+        @param workers (int): The number of worker processes.
+        @param threads (int): The number of intra-op threads of each worker.
+        """
+        from transformers import AutoTokenizer
+        from src.model_registry import get_model_config
+        from src.roberta_engine import prepare_shared_model
+
+        self.threads = threads
+        self.config = get_model_config(model_key)
+        self.tokenizer = AutoTokenizer.from_pretrained(self.config['tokenizer'], use_fast=True)
+        # Export or save the model here, so the workers never write the shared file themselves
+        weights_path = prepare_shared_model(self.config, backend)
+
+        # Workers are spawned rather than forked, as forking a process that already started torch threads is unsafe
+        super().__init__(workers, multiprocessing.get_context('spawn'), initialize_worker, (model_key, backend, weights_path, threads))
+        logging.info(f"Each RoBERTa worker runs {threads} torch threads.")
+
+    def predict(self, texts, batch_size):
+        """
+        Predict the sentiment of texts across the workers.
+
+        @param texts (list of str): The texts to analyze.
+        @param batch_size (int): The number of texts per forward pass.
+        @ret (tuple): A tuple containing:
+            - (np.ndarray): The adjusted prediction of each text, in input order.
+            - (np.ndarray): The negative, neutral and positive probabilities of each text, in input order.
+        """
+        import numpy as np
+        from src.roberta_token import tokenize_batches
+
+        start_time = time.perf_counter()
+        predictions = np.empty(len(texts), dtype=np.int64)
+        probabilities = np.empty((len(texts), 3), dtype=np.float64)
+        batches = 0
+
+        # Tokenize ahead in a background thread and keep a bounded number of batches in flight
+        pending = collections.deque()
+        for indices, input_ids, attention_masks in prefetch(tokenize_batches(texts, self.tokenizer, batch_size, self.config['max_length']), self.workers):
+            pending.append((indices, self.executor.submit(predict_batch, input_ids, attention_masks)))
+            batches += 1
+            if len(pending) > 2 * self.workers:
+                indices, future = pending.popleft()
+                predictions[indices], probabilities[indices] = future.result()
+        for indices, future in pending:
+            predictions[indices], probabilities[indices] = future.result()
+
+        elapsed = time.perf_counter() - start_time
+        throughput = len(texts) / elapsed if elapsed else 0.0
+        logging.info(f"RoBERTa: {len(texts)} texts in {batches} batches inferred across {self.workers} workers in {elapsed:.2f} seconds ({throughput:.1f} texts/s).")
+        return predictions, probabilities
+
+def get_roberta_pool(model_key, backend, workers=ROBERTA_WORKERS, threads=ROBERTA_THREADS_PER_WORKER):
+    """
+    Return the shared RoBERTa worker pool, starting it on first use or when a
+    different layout or different settings are requested.
+
+    @param model_key (str): The name of the model in the model registry.
+    @param backend (str): The name of the inference backend.
+    @param workers (int): The number of worker processes.
+    @param threads (int): The number of intra-op threads of each worker.
+    @ret (RobertaWorkerPool): The worker pool.
+    """
+    settings = (model_key, backend, workers, threads)
+    return get_shared_pool('roberta', settings, lambda: RobertaWorkerPool(*settings))
+
+def shutdown_roberta_pool():
+    """
+    Stop the shared RoBERTa worker pool, if it was started.
+
+    @param: None.
+    @ret: None.
+    """
+    shutdown_shared_pool('roberta')
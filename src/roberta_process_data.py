@@ -1,15 +1,50 @@
+import os
+import time
+import logging
+import collections
+import concurrent.futures
+import numpy as np
 import polars as pl
 import torch
-from transformers import AutoModelForSequenceClassification
-from src.roberta_token import tokenize_data
+from src.model_registry import SENTIMENT_MODEL, get_model_config
+from src.roberta_engine import ROBERTA_BACKEND, create_roberta_engine
+from src.roberta_token import TOKENIZATION_REVISION, tokenize_batches
+from src.roberta_pool import ROBERTA_WORKERS, ROBERTA_THREADS_PER_WORKER
+from utils.general.prefetch import prefetch
+from utils.general.lazy_loading import lazy_load
 
-# Define constants for the thresholds
-NEUTRAL_THRESHOLD = 0.7
-SLIGHT_THRESHOLD = 0.35
+# Define constants for the model and the thresholds, taken from the model registry
+MODEL_CONFIG = get_model_config(SENTIMENT_MODEL)
+MODEL = MODEL_CONFIG['model']
+NEUTRAL_THRESHOLD = MODEL_CONFIG['neutral_threshold']
+SLIGHT_THRESHOLD = MODEL_CONFIG['slight_threshold']
+
+# Number of texts per forward pass. Texts are bucketed by length, so most batches need little padding.
+ROBERTA_BATCH_SIZE = int(os.getenv('ROBERTA_BATCH_SIZE', MODEL_CONFIG['batch_size']))
+
+# Sentiment labels, indexed by the adjusted predictions
+LABELS = ["Negative", "Neutral", "Positive", "Slightly Negative", "Slightly Positive"]
+
+# Number of batches buffered between the tokenization, inference and formatting stages
+ROBERTA_PIPELINE_DEPTH = 2
+
+# Identifies the model, backend and tokenization in the sentiment result cache. The cache holds
+# class probabilities, so cached results stay valid when the thresholds change.
+CACHE_VERSION = f"{MODEL}|{ROBERTA_BACKEND}|tokens-v{TOKENIZATION_REVISION}"
 
 class DataFrameCreationError(Exception):
     pass
 
+@lazy_load("RoBERTa model")
+def get_roberta_engine():
+    """
+    Return the RoBERTa inference engine of the configured backend, loading the model on first use.
+
+    @param: None.
+    @ret (RobertaEngine): The inference engine.
+    """
+    return create_roberta_engine(MODEL_CONFIG, ROBERTA_BACKEND)
+
 def create_dataframe(processed_data):
     """
     Create a Polars DataFrame from processed data.
@@ -25,47 +60,155 @@ def create_dataframe(processed_data):
         print(f"Error creating DataFrame: {e}")
         raise DataFrameCreationError(f"Failed to create DataFrame: {e}")
 
+def softmax(logits):
+    """
+    Convert logits to class probabilities.
+
+    @param logits (torch.Tensor or np.ndarray): Model logits, one row per text.
+    @ret (np.ndarray): The class probabilities, one row per text.
+    """
+    if isinstance(logits, torch.Tensor):
+        return torch.nn.functional.softmax(logits, dim=1).detach().cpu().numpy()
+    logits = np.asarray(logits, dtype=np.float64)
+    exponentials = np.exp(logits - logits.max(axis=1, keepdims=True))
+    return exponentials / exponentials.sum(axis=1, keepdims=True)
+
+def adjust_probability_thresholds(probabilities, neutral_threshold=0.65, slight_threshold=0.4):
+    """
+    Map class probabilities to the five sentiment labels.
+
+    @param probabilities (np.ndarray): Negative, neutral and positive probabilities, one row per text.
+    @param neutral_threshold (float): Threshold for neutral classification.
+    @param slight_threshold (float): Threshold for slight classification.
+    @ret (np.ndarray): The adjusted predictions, indices into the label list.
+    """
+    probabilities = np.asarray(probabilities)
+    highest_prob_class = probabilities.argmax(axis=1)
+    highest_prob = probabilities.max(axis=1)
+    neutral_prob = probabilities[:, 1]
+
+    # A weak neutral leans towards whichever of negative and positive comes second
+    leans_negative = probabilities[:, 0] > probabilities[:, 2]
+    conditions = [
+        (highest_prob_class == 1) & (highest_prob > neutral_threshold),
+        (highest_prob_class == 2) & (neutral_prob > slight_threshold),
+        (highest_prob_class == 0) & (neutral_prob > slight_threshold),
+        highest_prob_class == 2,
+        highest_prob_class == 0,
+        leans_negative,
+    ]
+    choices = [
+        1,  # Neutral
+        4,  # Slightly Positive
+        3,  # Slightly Negative
+        2,  # Positive
+        0,  # Negative
+        3,  # Slightly Negative
+    ]
+    return np.select(conditions, choices, default=4)  # Slightly Positive
+
 def adjust_thresholds(logits, neutral_threshold=0.65, slight_threshold=0.4):
     """
     Adjust the thresholds for classification.
 
-    @param logits (torch.Tensor): Model logits.
+    @param logits (torch.Tensor or np.ndarray): Model logits.
+    @param neutral_threshold (float): Threshold for neutral classification.
+    @param slight_threshold (float): Threshold for slight classification.
+    @ret (np.ndarray): Array of adjusted predictions.
+    """
+    return adjust_probability_thresholds(softmax(logits), neutral_threshold, slight_threshold)
+
+def class_probabilities(logits, config=MODEL_CONFIG):
+    """
+    Convert model logits to negative, neutral and positive probabilities, whatever
+    order the model's classes are in.
+
+    @param logits (torch.Tensor or np.ndarray): Model logits, one row per text.
+    @param config (dict): The model's entry in the model registry.
+    @ret (np.ndarray): The negative, neutral and positive probabilities, one row per text. The
+        neutral probability is NaN for models without a neutral class.
+    """
+    probabilities = softmax(logits)
+    negative, neutral, positive = config['class_order']
+    neutral_probabilities = probabilities[:, neutral] if neutral is not None else np.full(len(probabilities), np.nan)
+    return np.column_stack((probabilities[:, negative], neutral_probabilities, probabilities[:, positive]))
+
+def label_probabilities(probabilities, neutral_threshold=NEUTRAL_THRESHOLD, slight_threshold=SLIGHT_THRESHOLD):
+    """
+    Map negative, neutral and positive probabilities to sentiment labels. Rows with a
+    neutral probability get the five threshold-adjusted labels; rows without one
+    are labeled Negative or Positive.
+
+    @param probabilities (np.ndarray): Negative, neutral and positive probabilities, one row per text.
     @param neutral_threshold (float): Threshold for neutral classification.
     @param slight_threshold (float): Threshold for slight classification.
-    @ret (list of ints): List of adjusted predictions.
-    """
-    probabilities = torch.nn.functional.softmax(logits, dim=1)
-    adjusted_predictions = []
-
-    for prob in probabilities:
-        highest_prob_class = torch.argmax(prob).item()
-        highest_prob = prob[highest_prob_class]
-
-        if highest_prob_class == 1 and highest_prob > neutral_threshold:
-            adjusted_predictions.append(1)  # Neutral
-        elif highest_prob_class == 2 and prob[1] > slight_threshold:
-            adjusted_predictions.append(4)  # Slightly Positive
-        elif highest_prob_class == 0 and prob[1] > slight_threshold:
-            adjusted_predictions.append(3)  # Slightly Negative
-        elif highest_prob_class == 2 and prob[1] <= slight_threshold:
-            adjusted_predictions.append(2)  # Positive
-        elif highest_prob_class == 0 and prob[1] <= slight_threshold:
-            adjusted_predictions.append(0)  # Negative
-        elif highest_prob_class == 1 and highest_prob <= neutral_threshold:
-            second_highest_prob_class = torch.argsort(prob, descending=True)[1].item()
-            if second_highest_prob_class == 0:
-                adjusted_predictions.append(3)  # Slightly Negative
-            elif second_highest_prob_class == 2:
-                adjusted_predictions.append(4)  # Slightly Positive
-
-    return adjusted_predictions
-
-def roberta_analyze_data(raw_data):
-    """
-    Analyze data using the RoBERTa model.
+    @ret (np.ndarray): The adjusted predictions, indices into LABELS.
+    """
+    probabilities = np.asarray(probabilities, dtype=np.float64)
+    predictions = np.where(probabilities[:, 2] > probabilities[:, 0], 2, 0)
+    has_neutral = ~np.isnan(probabilities[:, 1])
+    if has_neutral.any():
+        predictions[has_neutral] = adjust_probability_thresholds(probabilities[has_neutral], neutral_threshold, slight_threshold)
+    return predictions
+
+def postprocess_logits(logits, config=MODEL_CONFIG):
+    """
+    Map model logits to sentiment labels as declared by the model's registry entry.
+
+    @param logits (torch.Tensor or np.ndarray): Model logits, one row per text.
+    @param config (dict): The model's entry in the model registry.
+    @ret (tuple): A tuple containing:
+        - (np.ndarray): The adjusted predictions, indices into LABELS.
+        - (np.ndarray): The negative, neutral and positive probabilities, one row per text.
+    """
+    probabilities = class_probabilities(logits, config)
+    return label_probabilities(probabilities, config['neutral_threshold'], config['slight_threshold']), probabilities
+
+def predict_sentiment_classes(texts, engine, batch_size=ROBERTA_BATCH_SIZE, depth=ROBERTA_PIPELINE_DEPTH):
+    """
+    Predict the sentiment of texts in this process, in batches of similar length.
+    The stages overlap: the next batch is tokenized in a background thread and the
+    previous batch's logits are converted to predictions in another while the current
+    batch runs through the model. Each stage buffers at most depth batches.
+
+    @param texts (list of str): The texts to analyze.
+    @param engine (RobertaEngine): The inference engine.
+    @param batch_size (int): The number of texts per forward pass.
+    @param depth (int): The maximum number of batches waiting between two stages.
+    @ret (tuple): A tuple containing:
+        - (np.ndarray): The adjusted prediction of each text, in input order.
+        - (np.ndarray): The negative, neutral and positive probabilities of each text, in input order.
+    """
+    adjusted_predictions = np.empty(len(texts), dtype=np.int64)
+    probabilities = np.empty((len(texts), 3), dtype=np.float64)
+
+    def format_batch(indices, logits):
+        adjusted_predictions[indices], probabilities[indices] = postprocess_logits(logits, engine.config)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as formatter:
+        pending = collections.deque()
+        for indices, input_ids, attention_masks in prefetch(tokenize_batches(texts, engine.tokenizer, batch_size, engine.config['max_length']), depth):
+            logits = engine.predict_logits(input_ids, attention_masks)
+            pending.append(formatter.submit(format_batch, indices, logits))
+            if len(pending) > depth:
+                pending.popleft().result()
+        for future in pending:
+            future.result()
+    return adjusted_predictions, probabilities
+
+def roberta_analyze_data(raw_data, engine=None, batch_size=ROBERTA_BATCH_SIZE, workers=ROBERTA_WORKERS, threads=ROBERTA_THREADS_PER_WORKER):
+    """
+    Analyze data using the RoBERTa model. Texts are run in batches of similar length,
+    sharded across worker processes when more than one worker is configured, and the
+    results returned in input order.
     
     @param raw_data (list of lists): Raw input data.
-    @ret (list of lists): List of analysis results.
+    @param engine (RobertaEngine): The inference engine. Defaults to the engine shared by the process.
+    @param batch_size (int): The number of texts per forward pass.
+    @param workers (int): The number of worker processes. 1 runs inference in this process; ignored if an engine is given.
+    @param threads (int): The number of torch threads of each worker process, or of this process with one worker.
+    @ret (list of lists): List of analysis results: [id, text, label, negative, neutral, positive], where the
+        last three are the class probabilities (neutral is NaN for models without a neutral class).
 
     @raises DataFrameCreationError: If there is an error creating the DataFrame.
     """
@@ -75,17 +218,85 @@ def roberta_analyze_data(raw_data):
         print(e)
         return
 
-    input_ids, attention_masks = tokenize_data(df['text'].to_list())
+    texts = df['text'].to_list()
+    if engine is None and workers > 1:
+        from src.roberta_pool import get_roberta_pool
+        pool = get_roberta_pool(MODEL_CONFIG['name'], ROBERTA_BACKEND, workers, threads)
+        adjusted_predictions, probabilities = pool.predict(texts, batch_size)
+        pool.log_memory_report()
+    else:
+        # Set before the engine loads, as the ONNX session takes its thread count from torch
+        torch.set_num_threads(threads)
+        engine = engine or get_roberta_engine()
+        adjusted_predictions, probabilities = predict_sentiment_classes(texts, engine, batch_size)
+        engine.log_inference_report()
 
-    MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
-    model = AutoModelForSequenceClassification.from_pretrained(MODEL)
+    results = [[item[0], item[1], LABELS[pred], *row] for item, pred, row in zip(raw_data, adjusted_predictions, probabilities.tolist())]
 
-    with torch.no_grad():
-        outputs = model(input_ids, attention_mask=attention_masks)
+    return results
 
-    adjusted_predictions = adjust_thresholds(outputs.logits, neutral_threshold=NEUTRAL_THRESHOLD, slight_threshold=SLIGHT_THRESHOLD)
+def compare_roberta_backends(texts, backends=('pytorch', 'int8', 'onnx'), baseline='pytorch', batch_size=ROBERTA_BATCH_SIZE):
+    """
+    Run a sample of texts through several inference backends and compare each one's
+    throughput and labels against a baseline backend.
 
-    labels = ["Negative", "Neutral", "Positive", "Slightly Negative", "Slightly Positive"]
-    results = [[item[0], item[1], labels[pred]] for item, pred in zip(raw_data, adjusted_predictions)]
+    @param texts (list of str): The sample texts.
+    @param backends (tuple of str): The backends to compare.
+    @param baseline (str): The backend whose labels the others are compared against.
+    @param batch_size (int): The number of texts per forward pass.
+    @ret (dict): A dictionary mapping each backend to its load seconds, rows per second and label agreement with the baseline.
+    """
+    sample = [[index, text] for index, text in enumerate(texts)]
+    labels, report = {}, {}
+    for backend in dict.fromkeys([baseline, *backends]):
+        engine = create_roberta_engine(MODEL_CONFIG, backend)
+        start_time = time.perf_counter()
+        labels[backend] = [row[2] for row in roberta_analyze_data(sample, engine=engine, batch_size=batch_size)]
+        elapsed = time.perf_counter() - start_time
 
-    return results
+        agreement = np.mean(np.array(labels[backend]) == np.array(labels[baseline])) if texts else 1.0
+        report[backend] = {'load_seconds': engine.load_seconds, 'rows_per_second': len(texts) / elapsed if elapsed else 0.0, 'agreement': float(agreement)}
+        logging.info(
+            f"{MODEL_CONFIG['name']} [{backend}]: loaded in {engine.load_seconds:.2f} seconds, {report[backend]['rows_per_second']:.1f} texts/s, "
+            f"{report[backend]['agreement']:.2%} label agreement with {baseline}."
+        )
+    return report
+
+def benchmark_sentiment_models(texts, expected_labels, model_names, backend=ROBERTA_BACKEND):
+    """
+    Run a labeled sample through registered models and report each one's speed and accuracy.
+
+    @param texts (list of str): The sample texts.
+    @param expected_labels (list of str): The label of each text: one of LABELS.
+    @param model_names (list of str): The names of the models in the model registry.
+    @param backend (str): The inference backend.
+    @ret (dict): A dictionary mapping each model to its rows per second, batch latency percentiles in
+        milliseconds, its agreement with the expected labels, and its agreement once slight labels are
+        counted as their polarity (Negative, Neutral or Positive).
+    """
+    def polarity(labels):
+        return np.array([label.replace("Slightly ", "") for label in labels])
+
+    expected_labels = np.asarray(expected_labels)
+    report = {}
+    for name in model_names:
+        config = get_model_config(name)
+        engine = create_roberta_engine(config, backend)
+        start_time = time.perf_counter()
+        predictions, _ = predict_sentiment_classes(texts, engine, config['batch_size'])
+        elapsed = time.perf_counter() - start_time
+
+        labels = np.array(LABELS)[predictions]
+        latencies = np.percentile(engine.batch_seconds, [50, 95, 99]) * 1000 if engine.batch_seconds else [0.0] * 3
+        report[name] = {
+            'rows_per_second': len(texts) / elapsed if elapsed else 0.0,
+            'p50_ms': float(latencies[0]), 'p95_ms': float(latencies[1]), 'p99_ms': float(latencies[2]),
+            'agreement': float(np.mean(labels == expected_labels)) if len(texts) else 1.0,
+            'polarity_agreement': float(np.mean(polarity(labels) == polarity(expected_labels))) if len(texts) else 1.0,
+        }
+        logging.info(
+            f"{name} [{backend}]: {report[name]['rows_per_second']:.1f} texts/s, batch latency p50 {report[name]['p50_ms']:.0f} ms, "
+            f"p95 {report[name]['p95_ms']:.0f} ms, p99 {report[name]['p99_ms']:.0f} ms, {report[name]['agreement']:.2%} agreement "
+            f"({report[name]['polarity_agreement']:.2%} by polarity)."
+        )
+    return report
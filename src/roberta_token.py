@@ -1,31 +1,56 @@
-import torch
+import numpy as np
 from transformers import AutoTokenizer
+from src.model_registry import get_model_config
 
-def tokenize_data(text_series):
+# Longest input the model accepts, in tokens
+MAX_LENGTH = 512
+
+# Number of batches tokenized and bucketed by length at a time
+BATCHES_PER_WINDOW = 50
+
+# Revision of the tokenization and padding, part of the sentiment cache version. Bump it whenever
+# a change here alters the model's outputs, so results cached under the old inputs are not reused.
+# Revision 2: attention masks from the tokenizer (padding is masked) and per-batch dynamic padding.
+TOKENIZATION_REVISION = 2
+
+def tokenize_data(text_series, tokenizer=None, max_length=MAX_LENGTH):
     """
     Tokenize the text data using a pre-trained tokenizer from Hugging Face.
+    Texts are padded only to the longest text in the batch.
     
     @param text_series: A list of text data to be tokenized.
+    @param tokenizer: An already loaded tokenizer. The configured model's tokenizer is loaded if not given.
+    @param max_length: The number of tokens longer texts are truncated to.
     @ret: Tensors of input_ids and attention_masks for the model.
     """
-    MODEL = "cardiffnlp/twitter-roberta-base-sentiment"
-    tokenizer = AutoTokenizer.from_pretrained(MODEL)
-    
-    def tokenize(text):
-        """
-        Tokenize the given text.
-        
-        @param text: The text to tokenize.
-        @ret: Tokenized text.
-        """
-        return tokenizer.encode(text, truncation=True, padding='max_length', max_length=512)
-    
-    tokenized_texts = [tokenize(text) for text in text_series]
+    if tokenizer is None:
+        tokenizer = AutoTokenizer.from_pretrained(get_model_config()['tokenizer'], use_fast=True)
 
-    input_ids = torch.tensor(tokenized_texts)
+    encoding = tokenizer(list(text_series), truncation=True, max_length=max_length, padding='longest', return_tensors='pt')
+    return encoding['input_ids'], encoding['attention_mask']
 
-    # Create attention masks
-    attention_masks = [[float(i != 0) for i in seq] for seq in input_ids]
-    attention_masks = torch.tensor(attention_masks)
-    
-    return input_ids, attention_masks
+def tokenize_batches(text_series, tokenizer, batch_size, max_length=MAX_LENGTH, batches_per_window=BATCHES_PER_WINDOW):
+    """
+    Tokenize the text data and split it into batches of texts of similar length, each
+    padded only to its longest text. Texts are tokenized and sorted one window of
+    batches at a time, so batches are produced incrementally. The attention masks come
+    from the tokenizer, so padding is masked whatever the model's pad token ID is.
+
+    @param text_series: A list of text data to be tokenized.
+    @param tokenizer: An already loaded tokenizer.
+    @param batch_size: The number of texts per batch.
+    @param max_length: The number of tokens longer texts are truncated to.
+    @param batches_per_window: The number of batches whose texts are sorted by length together.
+    @ret: A generator of (indices, input_ids, attention_masks) tuples, where indices are
+        the positions of the batch's texts in text_series.
+    """
+    text_series = list(text_series)
+    window_size = batch_size * batches_per_window
+    for window_start in range(0, len(text_series), window_size):
+        token_ids = tokenizer(text_series[window_start:window_start + window_size], truncation=True, max_length=max_length)['input_ids']
+        order = np.argsort([len(ids) for ids in token_ids], kind='stable')
+
+        for start in range(0, len(order), batch_size):
+            indices = order[start:start + batch_size]
+            encoding = tokenizer.pad({'input_ids': [token_ids[i] for i in indices]}, padding='longest', return_tensors='pt')
+            yield indices + window_start, encoding['input_ids'], encoding['attention_mask']
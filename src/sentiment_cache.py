@@ -0,0 +1,37 @@
+import os
+import json
+import logging
+from utils.cache import DEFAULT_CACHE_DIR, SQLiteCache, hash_key
+
+# Initialize the on-disk sentiment result cache, shared by every run, table and model
+SENTIMENT_CACHE_PATH = os.getenv('SENTIMENT_CACHE_PATH', os.path.join(DEFAULT_CACHE_DIR, 'sentiment_cache.sqlite3'))
+SENTIMENT_CACHE_MAX_ENTRIES = int(os.getenv('SENTIMENT_CACHE_MAX_ENTRIES', 10_000_000))
+sentiment_cache = SQLiteCache(SENTIMENT_CACHE_PATH, max_entries=SENTIMENT_CACHE_MAX_ENTRIES)
+
+def lookup_sentiment_results(model_name, version, texts):
+    """
+    Look up previously computed sentiment results for a list of texts.
+
+    @param model_name (str): The name of the sentiment model, e.g. 'VADER'.
+    @param version (str): The model or rule version. Results of other versions are not reused.
+    @param texts (list of str): The texts to look up.
+    @ret (dict): A dictionary mapping the index of each cached text to its result.
+    """
+    keys = [hash_key(model_name, version, text) for text in texts]
+    cached = sentiment_cache.get_many(keys)
+    results = {index: json.loads(cached[key]) for index, key in enumerate(keys) if key in cached}
+    logging.info(f"{model_name} result cache: {len(results)} of {len(texts)} texts already scored.")
+    sentiment_cache.log_stats("Sentiment result")
+    return results
+
+def store_sentiment_results(model_name, version, texts, results):
+    """
+    Store sentiment results so later runs can reuse them.
+
+    @param model_name (str): The name of the sentiment model, e.g. 'VADER'.
+    @param version (str): The model or rule version the results were computed with.
+    @param texts (list of str): The analyzed texts.
+    @param results (list): The JSON-serializable result of each text.
+    @ret: None.
+    """
+    sentiment_cache.set_many({hash_key(model_name, version, text): json.dumps(result) for text, result in zip(texts, results)})
@@ -1,11 +1,27 @@
+import numpy as np
 from src.vader_analysis import vader_analyze_batch
-from src.roberta_process_data import roberta_analyze_data
-from utils.database.insert_data import insert_preprocessed_content_data, insert_vader_sentiment_data, insert_roberta_sentiment_data
-from src.normalization import preprocess_data
+from utils.database.insert_data import insert_preprocessed_content_data, insert_entity_data, insert_language_code_data, insert_vader_sentiment_data, insert_roberta_sentiment_data
+from utils.general.lazy_loading import lazy_load
+from utils.general.dedup import deduplicate
+from src.normalization import preprocess_data, resolve_language_codes
+from src.model_registry import SENTIMENT_MODEL
+from src.sentiment_cache import lookup_sentiment_results, store_sentiment_results
+
+@lazy_load("RoBERTa stack")
+def load_roberta_stack():
+    """
+    Import torch, transformers and the RoBERTa analysis on first use.
+
+    @param: None.
+    @ret (function): The roberta_analyze_data function.
+    """
+    from src.roberta_process_data import roberta_analyze_data
+    return roberta_analyze_data
 
 def preprocess_and_store_data(cursor, data, language, table_name):
     """
-    Preprocess the data and store the preprocessed data in the database.
+    Preprocess the data and store the resolved language codes, the preprocessed data
+    and its named entities in the database.
 
     @param cursor (object): The database cursor.
     @param data (np.ndarray): The raw data to preprocess.
@@ -13,8 +29,12 @@ def preprocess_and_store_data(cursor, data, language, table_name):
     @param table_name (str): The name of the table where the data should be stored.
     @ret (np.ndarray): The preprocessed data.
     """
-    preprocessed_data = preprocess_data(data, language)
+    language_codes = resolve_language_codes(data, language)
+    insert_language_code_data(cursor, [[item[0], language_code] for item, language_code in zip(data, language_codes)], table_name)
+
+    preprocessed_data, entity_data = preprocess_data(data, language, return_entities=True, language_codes=language_codes)
     insert_preprocessed_content_data(cursor, preprocessed_data, table_name)
+    insert_entity_data(cursor, preprocessed_data[:, 0] if len(preprocessed_data) else [], entity_data, table_name)
     return preprocessed_data
 
 def vader_sentiment_analysis(cursor, preprocessed_data, table_name):
@@ -33,17 +53,40 @@ def vader_sentiment_analysis(cursor, preprocessed_data, table_name):
 def roberta_sentiment_analysis(cursor, data, table_name):
     """
     Perform RoBERTa sentiment analysis and store the results in the database.
+    Identical texts are analyzed once and their result shared by every ID, and texts
+    analyzed by an earlier run with the same model are taken from the sentiment result
+    cache. The cache holds class probabilities, so the labels always reflect the
+    current thresholds.
 
     @param cursor (object): The database cursor.
     @param data (np.ndarray): The data to analyze.
     @param table_name (str): The name of the table where the results should be stored.
-    @ret (list of lists): The RoBERTa sentiment analysis results.
+    @ret (list of lists): The RoBERTa sentiment analysis results: [id, text, label, negative, neutral, positive].
     """
-    batch_size = 200  # Adjust batch size according to your memory capacity
-    roberta_results = []
-    for i in range(0, len(data), batch_size):
-        batch = data[i:i+batch_size]
-        roberta_results.extend(roberta_analyze_data(batch))
+    roberta_analyze_data = load_roberta_stack()
+    from src.roberta_process_data import CACHE_VERSION, LABELS, label_probabilities
+
+    unique_texts, inverse = deduplicate((item[1] for item in data), description="RoBERTa texts")
+    unique_probabilities = np.empty((len(unique_texts), 3), dtype=np.float64)
+    cached_probabilities = lookup_sentiment_results('RoBERTa', CACHE_VERSION, unique_texts)
+    for unique_index, probabilities in cached_probabilities.items():
+        unique_probabilities[unique_index] = probabilities
+    missing_data = np.array([[unique_index, text] for unique_index, text in enumerate(unique_texts) if unique_index not in cached_probabilities])
+
+    # The texts are batched by length inside roberta_analyze_data (see ROBERTA_BATCH_SIZE)
+    new_results = roberta_analyze_data(missing_data) if len(missing_data) else []
+
+    for unique_index, _, _, *probabilities in new_results:
+        unique_probabilities[int(unique_index)] = probabilities
+    if new_results:
+        store_sentiment_results('RoBERTa', CACHE_VERSION, [row[1] for row in new_results], [row[3:] for row in new_results])
+
+    # Label from the probabilities rounded to the single precision they are stored in, compared in double precision
+    # against the thresholds as PostgreSQL does, so relabel_roberta_sentiment reproduces the same labels
+    stored_probabilities = unique_probabilities.astype(np.float32).astype(np.float64)
+    unique_labels = np.array(LABELS, dtype=object)[label_probabilities(stored_probabilities)]
+    unique_rows = unique_probabilities.tolist()
+    roberta_results = [[item[0], item[1], unique_labels[unique_index], *unique_rows[unique_index]] for item, unique_index in zip(data, inverse)]
     insert_roberta_sentiment_data(cursor, roberta_results, table_name)
     return roberta_results
 
@@ -70,9 +113,9 @@ def prompt_model_selection():
     @param: None.
     @ret (int or str): The chosen model number (1 for VADER, 2 for RoBERTa, and anything else for all models). 'quit' to quit.
     """
-    print("""Sentiment Analysis Models:
+    print(f"""Sentiment Analysis Models:
     1. VADER
-    2. Hugging Face's RoBERTa
+    2. Hugging Face's RoBERTa (model '{SENTIMENT_MODEL}', set SENTIMENT_MODEL to use another registered model)
     
     Enter any other key to run all models. To quit, enter `quit`
     """)
@@ -0,0 +1,326 @@
+import os
+import time
+import random
+import logging
+import threading
+import concurrent.futures
+from collections import defaultdict
+from utils.cache import DEFAULT_CACHE_DIR, SQLiteCache, hash_key
+from utils.general.lazy_loading import lazy_load
+
+# Initialize the on-disk translation cache, shared by every worker and run
+TRANSLATION_CACHE_PATH = os.getenv('TRANSLATION_CACHE_PATH', os.path.join(DEFAULT_CACHE_DIR, 'translation_cache.sqlite3'))
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv('TRANSLATION_CACHE_MAX_ENTRIES', 5_000_000))
+translation_cache = SQLiteCache(TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_MAX_ENTRIES)
+
+# Translation stage settings: backend, concurrency, rate limit and retries
+TRANSLATION_BACKEND = os.getenv('TRANSLATION_BACKEND', 'amazon')
+TRANSLATION_WORKERS = int(os.getenv('TRANSLATION_WORKERS', 8))
+TRANSLATION_REQUESTS_PER_SECOND = float(os.getenv('TRANSLATION_REQUESTS_PER_SECOND', 20))
+TRANSLATION_MAX_RETRIES = int(os.getenv('TRANSLATION_MAX_RETRIES', 4))
+TRANSLATION_BACKOFF_SECONDS = 0.5
+
+# Texts in the target language are never sent for translation
+TARGET_LANGUAGE = 'en'
+
+# Guards the per-language metrics, which the translation threads update concurrently
+_stats_lock = threading.Lock()
+
+class TranslationError(Exception):
+    pass
+
+class TranslationBackend:
+    """
+    Interface for the services that translate text to English.
+    """
+    name = 'base'
+
+    def translate(self, text, language):
+        """
+        Translate text to English.
+
+        @param text (str): The text to translate.
+        @param language (str or None): The source language code, or None to let the service detect it.
+        @ret (str): The translated text.
+
+        @raises TranslationError: If the text cannot be translated.
+        """
+        raise NotImplementedError
+
+    def is_retryable(self, error):
+        """
+        Decide whether a failed translation is worth retrying.
+
+        @param error (Exception): The error raised by translate.
+        @ret (bool): True if the request may succeed when retried.
+        """
+        return True
+
+class AmazonTranslateBackend(TranslationBackend):
+    """
+    Translate text with Amazon Translate.
+    """
+    name = 'amazon'
+
+    # Errors that will fail again no matter how often the request is retried
+    NON_RETRYABLE_ERRORS = {
+        'DetectedLanguageLowConfidenceException',
+        'InvalidRequestException',
+        'TextSizeLimitExceededException',
+        'UnsupportedLanguagePairException',
+    }
+
+    def __init__(self, region_name='us-east-1'):
+        import boto3
+        from botocore.config import Config
+
+        # Retries are handled by the translation stage, so let boto3 make a single attempt
+        self.client = boto3.client('translate', region_name=region_name, config=Config(retries={'max_attempts': 1, 'mode': 'standard'}))
+
+    def translate(self, text, language):
+        response = self.client.translate_text(
+            Text=text,
+            SourceLanguageCode=language if language is not None else 'auto',
+            TargetLanguageCode=TARGET_LANGUAGE
+        )
+        return response['TranslatedText']
+
+    def is_retryable(self, error):
+        error_code = getattr(error, 'response', {}).get('Error', {}).get('Code')
+        return error_code not in self.NON_RETRYABLE_ERRORS
+
+class StubTranslateBackend(TranslationBackend):
+    """
+    Local stand-in translator for offline benchmarking and tests. Returns the text
+    unchanged after an optional simulated request latency.
+    """
+    name = 'stub'
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+
+    def translate(self, text, language):
+        if self.latency:
+            time.sleep(self.latency)
+        return text
+
+# Available translation backends by name
+TRANSLATION_BACKENDS = {
+    AmazonTranslateBackend.name: AmazonTranslateBackend,
+    StubTranslateBackend.name: StubTranslateBackend,
+}
+
+def get_translation_backend(name=TRANSLATION_BACKEND):
+    """
+    Create a translation backend by name.
+
+    @param name (str): The name of the backend ('amazon' or 'stub').
+    @ret (TranslationBackend): The translation backend.
+
+    @raises ValueError: If the backend name is unknown.
+    """
+    if name not in TRANSLATION_BACKENDS:
+        raise ValueError(f"Unknown translation backend '{name}'. Choose from: {', '.join(TRANSLATION_BACKENDS)}.")
+    return TRANSLATION_BACKENDS[name]()
+
+class RateLimiter:
+    """
+    Thread-safe limiter that spaces requests evenly to stay under a request rate.
+    """
+
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self.next_request_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Block until the next request may be sent.
+
+        @param: None.
+        @ret: None.
+        """
+        with self.lock:
+            now = time.monotonic()
+            wait = self.next_request_at - now
+            self.next_request_at = max(now, self.next_request_at) + self.interval
+        if wait > 0:
+            time.sleep(wait)
+
+# Rate limiter shared by single-text translations, created on first use
+_default_rate_limiter = None
+
+@lazy_load("translation backend")
+def get_default_backend():
+    """
+    Return the configured translation backend, creating it on first use.
+
+    @param: None.
+    @ret (TranslationBackend): The translation backend.
+    """
+    return get_translation_backend()
+
+def create_language_stats():
+    """
+    Create an empty set of translation metrics for one source language.
+
+    @param: None.
+    @ret (dict): The metrics, all set to zero.
+    """
+    return {'texts': 0, 'characters': 0, 'cache_hits': 0, 'retries': 0, 'failures': 0, 'request_seconds': 0.0}
+
+def translate_text(text, language):
+    """
+    Translate a single text to English, using the translation cache.
+
+    @param text (str): The text to translate.
+    @param language (str): The source language code.
+    @ret (str): The translated text, or the original text if translation fails.
+    """
+    global _default_rate_limiter
+    if not text.strip() or language == TARGET_LANGUAGE:
+        return text
+
+    # Check if the text and language pair is already in the cache
+    cache_key = hash_key(text, language)
+    cached_translation = translation_cache.get(cache_key)
+    if cached_translation is not None:
+        return cached_translation
+
+    if _default_rate_limiter is None:
+        _default_rate_limiter = RateLimiter(TRANSLATION_REQUESTS_PER_SECOND)
+    try:
+        translation = translate_with_retries(get_default_backend(), _default_rate_limiter, text, language, TRANSLATION_MAX_RETRIES, create_language_stats())
+    except TranslationError as e:
+        logging.warning(e)
+        return text  # If translation fails, use original text
+    translation_cache.set(cache_key, translation)
+    return translation
+
+def translate_with_retries(backend, rate_limiter, text, language, max_retries, stats):
+    """
+    Translate one text, retrying with exponential backoff on retryable errors. The time
+    spent on the text, waits and retries included, is added to the language's metrics.
+
+    @param backend (TranslationBackend): The translation backend.
+    @param rate_limiter (RateLimiter): The limiter shared by all requests.
+    @param text (str): The text to translate.
+    @param language (str or None): The source language code.
+    @param max_retries (int): The maximum number of retries after the first attempt.
+    @param stats (dict): The metrics of the text's language, updated in place.
+    @ret (str): The translated text.
+
+    @raises TranslationError: If every attempt fails.
+    """
+    start_time = time.perf_counter()
+    try:
+        for attempt in range(max_retries + 1):
+            rate_limiter.acquire()
+            try:
+                return backend.translate(text, language)
+            except Exception as e:
+                if attempt == max_retries or not backend.is_retryable(e):
+                    raise TranslationError(f"Failed to translate text from '{language or 'auto'}': {e}") from e
+                with _stats_lock:
+                    stats['retries'] += 1
+                time.sleep(TRANSLATION_BACKOFF_SECONDS * (2 ** attempt) * random.uniform(0.5, 1.5))
+    finally:
+        with _stats_lock:
+            stats['request_seconds'] += time.perf_counter() - start_time
+
+def translate_batch(texts, language_codes, backend=None, max_workers=TRANSLATION_WORKERS,
+                    requests_per_second=TRANSLATION_REQUESTS_PER_SECOND, max_retries=TRANSLATION_MAX_RETRIES, metrics=None):
+    """
+    Translate a batch of texts to English. Texts are grouped by source language,
+    looked up in the translation cache, and the remaining unique texts are sent to
+    the backend with bounded concurrency, rate limiting and retries.
+
+    @param texts (list of str): The texts to translate.
+    @param language_codes (list of str): The source language code of each text, None to auto-detect.
+    @param backend (TranslationBackend): The translation backend. Defaults to the configured backend.
+    @param max_workers (int): The maximum number of concurrent translation requests.
+    @param requests_per_second (float): The maximum request rate, 0 for no limit.
+    @param max_retries (int): The maximum number of retries per text.
+    @param metrics (dict): Optional dictionary filled with per-language metrics. Languages share one
+        thread pool, so each language is timed by the summed duration of its requests.
+    @ret (list of str): The translated texts, in input order. Texts that fail to translate are returned unchanged.
+    """
+    if backend is None:
+        backend = get_default_backend()
+
+    # Group the positions of each unique text by source language, skipping empty and English texts
+    groups = defaultdict(lambda: defaultdict(list))
+    skipped = 0
+    for position, (text, language) in enumerate(zip(texts, language_codes)):
+        if language == TARGET_LANGUAGE:
+            skipped += 1
+        elif text.strip():
+            groups[language][text].append(position)
+    if skipped:
+        logging.info(f"Skipped translation of {skipped} texts already in English.")
+
+    translations = list(texts)
+    language_stats = metrics if metrics is not None else {}
+    rate_limiter = RateLimiter(requests_per_second)
+    new_translations = {}
+    start_time = time.perf_counter()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        future_to_request = {}
+        for language, positions_by_text in groups.items():
+            stats = language_stats.setdefault(language or 'auto', create_language_stats())
+
+            keys = {text: hash_key(text, language) for text in positions_by_text}
+            cached = translation_cache.get_many(list(keys.values()))
+            for text, positions in positions_by_text.items():
+                stats['texts'] += len(positions)
+                if keys[text] in cached:
+                    stats['cache_hits'] += len(positions)
+                    for position in positions:
+                        translations[position] = cached[keys[text]]
+                    continue
+                stats['characters'] += len(text)
+                future = executor.submit(translate_with_retries, backend, rate_limiter, text, language, max_retries, stats)
+                future_to_request[future] = (language, text)
+
+        for future in concurrent.futures.as_completed(future_to_request):
+            language, text = future_to_request[future]
+            stats = language_stats[language or 'auto']
+            try:
+                translation = future.result()
+                new_translations[hash_key(text, language)] = translation
+            except TranslationError as e:
+                logging.warning(e)
+                stats['failures'] += 1
+                translation = text  # If translation fails, use original text
+            for position in groups[language][text]:
+                translations[position] = translation
+
+    translation_cache.set_many(new_translations)
+    batch_texts = sum(len(positions) for positions_by_text in groups.values() for positions in positions_by_text.values())
+    log_translation_metrics(language_stats, batch_texts, time.perf_counter() - start_time)
+    translation_cache.log_stats("Translation")
+    return translations
+
+def log_translation_metrics(metrics, texts, seconds):
+    """
+    Log the metrics and throughput of each source language, and the throughput of the whole batch.
+    A language's throughput counts the texts not found in the cache, per second of request time
+    summed over the concurrent requests.
+
+    @param metrics (dict): A dictionary mapping language codes to their metrics.
+    @param texts (int): The number of texts of the batch, English texts excluded.
+    @param seconds (float): The wall time of the batch.
+    @ret: None.
+    """
+    for language, stats in sorted(metrics.items()):
+        request_seconds = stats['request_seconds']
+        text_rate = (stats['texts'] - stats['cache_hits']) / request_seconds if request_seconds else float('inf')
+        character_rate = stats['characters'] / request_seconds if request_seconds else float('inf')
+        logging.info(
+            f"Translation [{language}]: {stats['texts']} texts ({stats['cache_hits']} cached, {stats['characters']} characters sent) "
+            f"in {request_seconds:.2f} request seconds ({text_rate:.1f} texts/s, {character_rate:.1f} chars/s), "
+            f"{stats['retries']} retries, {stats['failures']} failures."
+        )
+    throughput = texts / seconds if seconds else float('inf')
+    logging.info(f"Translation: {texts} texts in {seconds:.2f} seconds ({throughput:.1f} texts/s).")
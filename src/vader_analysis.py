@@ -1,9 +1,136 @@
+import os
+import re
+import sys
+import json
+import logging
+import multiprocessing
+import concurrent.futures
 import numpy as np
+from utils.general.dedup import deduplicate
+from utils.json.json_utils import load_json
+from utils.cache import hash_key
+from src.sentiment_cache import lookup_sentiment_results, store_sentiment_results
 from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
 
 # Initialize the VADER sentiment analyzer once
 vader_analyzer = SentimentIntensityAnalyzer()
 
+# Number of worker processes for batch scoring and the number of texts sent to a worker at once
+VADER_WORKERS = int(os.getenv('VADER_WORKERS', os.cpu_count() or 1))
+VADER_CHUNK_SIZE = 5000
+
+# Compound score thresholds for the Positive and Negative labels
+VADER_POSITIVE_THRESHOLD = 0.05
+VADER_NEGATIVE_THRESHOLD = -0.05
+
+# Batch results: one record per item, with compact float32 score columns next to the label
+VADER_SCORE_FIELDS = ['neg', 'neu', 'pos', 'compound']
+VADER_RESULT_DTYPE = np.dtype([('id', object), ('text', object), ('sentiment', object)] + [(field, np.float32) for field in VADER_SCORE_FIELDS])
+
+# Custom rules file: phrase adjustments and the positive words discounted in negative posts
+VADER_RULES_PATH = os.getenv('VADER_RULES_PATH', os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'data', 'vader_rules.json')))
+
+def build_trie_pattern(phrases):
+    """
+    Build a regular expression matching any of the phrases, nested by shared prefixes
+    so each position of the text only tries the branches that can still match.
+
+    @param phrases (list of str): The phrases to match.
+    @ret (str): The regular expression, preferring the longest phrase at each position.
+    """
+    trie = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[''] = True
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char != '']
+        if not branches:
+            return ''
+        alternation = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        # A phrase ends here, so the longer continuations are optional
+        return '(?:' + alternation + ')?' if '' in node else alternation
+
+    return build(trie)
+
+class VaderRuleSet:
+    """
+    Custom VADER rules compiled once: every phrase's compound score is computed up
+    front, and all phrases are found with a single scan of the lowercased text.
+    """
+
+    def __init__(self, custom_rules, positive_words):
+        """
+        @param custom_rules (dict): A dictionary mapping phrases to the compound score they should contribute.
+        @param positive_words (list of str): Positive words discounted when the overall sentiment is negative.
+        """
+        self.custom_rules = custom_rules
+        self.positive_words = positive_words
+        # Identifies these rules in the sentiment result cache
+        self.version = hash_key(json.dumps({'custom_rules': custom_rules, 'positive_words': positive_words}, sort_keys=True))
+        self.rule_order = {phrase: index for index, phrase in enumerate(custom_rules)}
+
+        phrases = [phrase for phrase in dict.fromkeys([*custom_rules, *positive_words]) if phrase]
+        self.phrase_scores = {phrase: vader_analyzer.polarity_scores(phrase)['compound'] for phrase in phrases}
+        # Lookahead so overlapping phrases are all found; shorter phrases sharing a start are recovered from prefixes
+        self.pattern = re.compile(f"(?=({build_trie_pattern(phrases)}))") if phrases else None
+        self.prefixes = {phrase: [other for other in phrases if phrase.startswith(other)] for phrase in phrases}
+
+    def find_phrases(self, text):
+        """
+        Find every rule phrase and positive word contained in the text, ignoring case.
+
+        @param text (str): The text to scan.
+        @ret (set of str): The phrases found in the text.
+        """
+        found = set()
+        if self.pattern is not None:
+            for match in self.pattern.finditer(text.lower()):
+                found.update(self.prefixes[match.group(1)])
+        return found
+
+    def apply(self, sentiment, text):
+        """
+        Fine-tune the sentiment scores of a text with the custom rules.
+
+        @param sentiment (dict): The VADER sentiment scores of the text, updated in place.
+        @param text (str): The analyzed text.
+        @ret (dict): The adjusted sentiment scores.
+        """
+        found = self.find_phrases(text)
+
+        # Replace the score of each matched phrase with its custom adjustment, in rule order
+        for phrase in sorted(found.intersection(self.rule_order), key=self.rule_order.get):
+            sentiment['compound'] -= self.phrase_scores[phrase]
+            sentiment['compound'] += self.custom_rules[phrase]
+
+        # If overall sentiment should be negative, adjust presence of positive words
+        if sentiment['compound'] < -0.2:
+            for word in self.positive_words:
+                if word in found:
+                    sentiment['compound'] -= self.phrase_scores[word]
+
+        return sentiment
+
+def load_vader_rules(file_path=VADER_RULES_PATH):
+    """
+    Load and compile the custom VADER rules from a JSON file.
+
+    @param file_path (str): The path to the JSON rules file, with 'custom_rules' and 'positive_words' keys.
+    @ret (VaderRuleSet): The compiled rules.
+
+    @raises RuntimeError: If the rules file cannot be loaded.
+    """
+    rules = load_json(file_path)
+    if rules is None:
+        raise RuntimeError(f"Failed to load VADER rules from '{file_path}'")
+    return VaderRuleSet(rules.get('custom_rules', {}), rules.get('positive_words', []))
+
+# Compile the custom rules once
+vader_rules = load_vader_rules()
+
 def vader_analyze_sentiment(text):
     """
     Analyze the sentiment of the text using VADER and apply custom rules.
@@ -16,64 +143,7 @@ def vader_analyze_sentiment(text):
         - 'compound' (float): Compound sentiment score.
     """
     sentiment = vader_analyzer.polarity_scores(text)
-
-    custom_rules = {
-        "achievement": 0.2,
-        "backlash": -0.3,
-        "bankruptcy": -0.6,
-        "bravery": 0.3,
-        "challenge": -0.2,
-        "courage": 0.3,
-        "dim lights": -0.4,
-        "fear": -0.6,
-        "flee": -0.7,
-        "forced": -0.5,
-        "heroism": 0.2,
-        "inspiration": 0.2,
-        "struggle": -0.4,
-        "support": 0.3,
-        "thank": 0.3,
-        "threaten": -0.7,
-        "unity": 0.2,
-        "victory": 0.2,
-        "abysmal": -0.5,
-        "ail": -0.4,
-        "broken": -0.5,
-        "poor": -0.3,
-        "weird": -0.45,
-        "cut sanitation services": -0.5,
-        "not heartless cynical": -0.65,
-        "invite": 0.15,
-        "r e p e n t": -0.2,
-        "like": 0,
-        "committed": 0,
-        "darkest hour": 0,
-        "energy": 0,
-        "lead": 0,
-        "livelihood": 0,
-        "party": 0,  # Usually reference political party
-        "play": 0,
-        "great britain": 0,
-        "united kingdom": 0,
-        "united states": 0,
-        "united nations": 0
-    }
-    
-    positive_words = ["love", "loved", "great", "excellent", "fantastic", "wonderful"]
-
-    # Fine-tune the sentiment score based on specific rules
-    for phrase, adjustment in custom_rules.items():
-        if phrase in text.lower():
-            sentiment['compound'] -= vader_analyzer.polarity_scores(phrase)['compound']
-            sentiment['compound'] += adjustment
-    
-    # If overall sentiment should be negative, adjust presence of positive words
-    if sentiment['compound'] < -0.2:
-        for word in positive_words:
-            if word in text.lower():
-                sentiment['compound'] -= vader_analyzer.polarity_scores(word)['compound']
-
-    return sentiment
+    return vader_rules.apply(sentiment, text)
 
 def vader_label_sentiment(sentiment):
     """
@@ -82,28 +152,104 @@ def vader_label_sentiment(sentiment):
     @param sentiment (dict): The sentiment score to label, including 'compound' key.
     @ret (str): The corresponding sentiment label as a string ('Positive', 'Negative', 'Neutral').
     """
-    if sentiment['compound'] >= 0.05:
+    if sentiment['compound'] >= VADER_POSITIVE_THRESHOLD:
         return "Positive"
-    elif sentiment['compound'] <= -0.05:
+    elif sentiment['compound'] <= VADER_NEGATIVE_THRESHOLD:
         return "Negative"
     else:
         return "Neutral"
 
-def vader_analyze_batch(data):
+def vader_label_scores(compound, positive_threshold=VADER_POSITIVE_THRESHOLD, negative_threshold=VADER_NEGATIVE_THRESHOLD):
+    """
+    Label many compound scores at once, e.g. to re-apply new thresholds to stored scores.
+
+    @param compound (np.ndarray): The compound sentiment scores.
+    @param positive_threshold (float): The minimum compound score labeled 'Positive'.
+    @param negative_threshold (float): The maximum compound score labeled 'Negative'.
+    @ret (np.ndarray): The sentiment labels ('Positive', 'Negative', 'Neutral').
+    """
+    compound = np.asarray(compound)
+    return np.select([compound >= positive_threshold, compound <= negative_threshold], ["Positive", "Negative"], default="Neutral").astype(object)
+
+def vader_score_texts(texts):
     """
-    Analyze sentiments for a batch of data items.
+    Score a chunk of texts. Runs in the batch scoring workers.
+
+    @param texts (list of str): The texts to analyze.
+    @ret (np.ndarray): An array of shape (n, 4) holding the neg, neu, pos and compound scores of each text.
+    """
+    scores = np.empty((len(texts), len(VADER_SCORE_FIELDS)), dtype=np.float64)
+    for i, text in enumerate(texts):
+        sentiment = vader_analyze_sentiment(text)
+        scores[i] = [sentiment[field] for field in VADER_SCORE_FIELDS]
+    return scores
+
+def vader_score_parallel(texts, workers=VADER_WORKERS, chunk_size=VADER_CHUNK_SIZE):
+    """
+    Score texts in chunks spread over a process pool. Each worker loads the analyzer
+    and compiled rules once, either by inheriting them through fork on Linux or by
+    importing this module elsewhere, where forking a threaded parent is unsafe. The
+    chunk results stream back in input order.
+
+    @param texts (list of str): The texts to analyze.
+    @param workers (int): The number of worker processes.
+    @param chunk_size (int): The number of texts sent to a worker at once.
+    @ret (np.ndarray): An array of shape (n, 4) holding the neg, neu, pos and compound scores of each text.
+    """
+    chunks = [texts[i:i+chunk_size] for i in range(0, len(texts), chunk_size)]
+    workers = min(workers, len(chunks))
+    start_method = 'fork' if sys.platform.startswith('linux') else 'spawn'
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method)) as executor:
+        scores = np.concatenate(list(executor.map(vader_score_texts, chunks)))
+    logging.info(f"Scored {len(texts)} texts with VADER across {workers} workers.")
+    return scores
+
+def vader_analyze_batch(data, workers=VADER_WORKERS, use_cache=True):
+    """
+    Analyze sentiments for a batch of data items. Identical texts are scored once,
+    texts scored by an earlier run with the same rules are taken from the sentiment
+    result cache, and large batches are scored in parallel.
 
     @param data (np.ndarray): A NumPy array of [index, text] pairs.
-    @ret (np.ndarray): A NumPy array of [index, text, sentiment_label].
+    @param workers (int): The number of worker processes. 1 scores in this process.
+    @param use_cache (bool): Whether to reuse and store results in the sentiment result cache.
+    @ret (np.ndarray): A structured NumPy array of VADER_RESULT_DTYPE records, one per item:
+        [index, text, sentiment_label, neg, neu, pos, compound]. Records can be indexed like
+        the [index, text, sentiment_label] rows, and the score columns by name.
     """
     # Convert to NumPy array if not already
     if not isinstance(data, np.ndarray):
         data = np.array(data)
+    if len(data) == 0:
+        return np.empty(0, dtype=VADER_RESULT_DTYPE)
 
-    results = []
-    for index, text in data:
-        sentiment = vader_analyze_sentiment(text)
-        sentiment_label = vader_label_sentiment(sentiment)
-        results.append([index, text, sentiment_label])
+    unique_texts, inverse = deduplicate((text for _, text in data), description="VADER texts")
+    unique_scores = np.empty((len(unique_texts), len(VADER_SCORE_FIELDS)), dtype=np.float64)
+
+    cached_scores = lookup_sentiment_results('VADER', vader_rules.version, unique_texts) if use_cache else {}
+    for index, scores in cached_scores.items():
+        unique_scores[index] = scores
+    missing = [index for index in range(len(unique_texts)) if index not in cached_scores]
+    missing_texts = [unique_texts[index] for index in missing]
+
+    if workers > 1 and len(missing_texts) > VADER_CHUNK_SIZE:
+        unique_scores[missing] = vader_score_parallel(missing_texts, workers)
+    elif missing_texts:
+        unique_scores[missing] = vader_score_texts(missing_texts)
+    if use_cache and missing_texts:
+        store_sentiment_results('VADER', vader_rules.version, missing_texts, unique_scores[missing].tolist())
+    # Label from the compound scores rounded to the single precision they are stored in, compared in double precision
+    # against the thresholds as PostgreSQL does, so relabel_vader_sentiment reproduces the same labels
+    stored_compound = unique_scores[:, VADER_SCORE_FIELDS.index('compound')].astype(np.float32).astype(np.float64)
+    unique_labels = vader_label_scores(stored_compound)
+
+    inverse = np.asarray(inverse, dtype=np.intp)
+    results = np.empty(len(data), dtype=VADER_RESULT_DTYPE)
+    results['id'] = data[:, 0]
+    results['text'] = data[:, 1]
+    results['sentiment'] = unique_labels[inverse]
+    for column, field in enumerate(VADER_SCORE_FIELDS):
+        results[field] = unique_scores[inverse, column]
 
-    return np.array(results)
\ No newline at end of file
+    return results
\ No newline at end of file
@@ -9,18 +9,25 @@ from .database import (
     create_content_table,
     create_preprocessed_content_table,
     create_language_table,
+    create_entities_table,
     create_vader_sentiment_table,
     create_roberta_sentiment_table,
     create_geospatial_analysis_table,
-    fetch_content_data,
-    fetch_language_data,
-    fetch_geospatial_data,
+    stream_query,
+    stream_table_frames,
+    split_table_frame,
+    upsert_rows,
+    copy_upsert,
     insert_content_data,
     insert_preprocessed_content_data,
     insert_language_data,
+    insert_language_code_data,
+    insert_entity_data,
     insert_geospatial_data,
     insert_vader_sentiment_data,
     insert_roberta_sentiment_data,
+    relabel_vader_sentiment,
+    relabel_roberta_sentiment,
     close_connection_to_database
 )
 
@@ -29,4 +36,7 @@ from .general import (
     get_table_name_from_user,
     check_table_exists,
     language_mapping
-)
\ No newline at end of file
+)
+
+# Import cache functions
+from .cache import SQLiteCache, hash_key
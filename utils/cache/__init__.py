@@ -0,0 +1 @@
+from .sqlite_cache import DEFAULT_CACHE_DIR, SQLiteCache, hash_key
@@ -0,0 +1,204 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+# Directory that holds the on-disk caches, relative to the project root
+DEFAULT_CACHE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'cache'))
+
+# Entries are marked as used at most once per this many seconds, so repeated hits do not each cost a write
+ACCESS_RESOLUTION_SECONDS = 3600
+
+# SQLite's limit on bound parameters is not reached with chunks of this many keys
+KEY_CHUNK_SIZE = 500
+
+def hash_key(*parts):
+    """
+    Build a stable cache key from the given parts.
+
+    @param parts (str): The values identifying a cache entry. None is treated as an empty string.
+    @ret (str): The SHA-256 hex digest of the parts.
+    """
+    joined = '\x1f'.join('' if part is None else str(part) for part in parts)
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()
+
+class SQLiteCache:
+    """
+    A persistent key-value cache backed by SQLite.
+
+    The database runs in WAL mode so any number of threads and processes can read
+    and write it at the same time. Each thread of each process opens its own
+    connection. Once the cache holds more than max_entries rows, the least recently
+    used evict_fraction of them is deleted.
+
+    The size of the cache is counted only when this instance's running estimate of it
+    reaches max_entries, or after every evict_fraction of max_entries rows it wrote,
+    so writes of other processes are noticed within that many rows.
+    """
+
+    def __init__(self, path, max_entries=1_000_000, evict_fraction=0.1):
+        """
+        @param path (str): The path of the SQLite database file.
+        @param max_entries (int): The maximum number of entries kept in the cache.
+        @param evict_fraction (float): The fraction of entries removed once the limit is exceeded.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.evict_fraction = evict_fraction
+        self.hits = 0
+        self.misses = 0
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._size = None
+        self._written = 0
+
+    def _connection(self):
+        """
+        Return the connection of the current thread, opening it on first use or after a fork.
+
+        @param: None.
+        @ret (sqlite3.Connection): The SQLite connection.
+        """
+        if getattr(self._local, 'pid', None) != os.getpid():
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute("PRAGMA synchronous=NORMAL;")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    accessed_at REAL NOT NULL
+                );
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return self._local.conn
+
+    def _count(self, hits, misses):
+        """
+        Update the hit and miss counters.
+
+        @param hits (int): The number of hits to add.
+        @param misses (int): The number of misses to add.
+        @ret: None.
+        """
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+
+    def get(self, key):
+        """
+        Look up a single key.
+
+        @param key (str): The cache key.
+        @ret (str or None): The cached value, or None if the key is not cached.
+        """
+        return self.get_many([key]).get(key)
+
+    def get_many(self, keys):
+        """
+        Look up several keys at once and mark the found entries as recently used.
+
+        @param keys (list of str): The cache keys.
+        @ret (dict): A dictionary mapping each cached key to its value.
+        """
+        keys = list(dict.fromkeys(keys))
+        found = {}
+        stale = []
+        now = time.time()
+        conn = self._connection()
+        for i in range(0, len(keys), KEY_CHUNK_SIZE):
+            chunk = keys[i:i+KEY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            rows = conn.execute(f"SELECT key, value, accessed_at FROM cache WHERE key IN ({placeholders});", chunk).fetchall()
+            for key, value, accessed_at in rows:
+                found[key] = value
+                if accessed_at < now - ACCESS_RESOLUTION_SECONDS:
+                    stale.append(key)
+        for i in range(0, len(stale), KEY_CHUNK_SIZE):
+            chunk = stale[i:i+KEY_CHUNK_SIZE]
+            placeholders = ','.join('?' * len(chunk))
+            conn.execute(f"UPDATE cache SET accessed_at = ? WHERE key IN ({placeholders});", [now, *chunk])
+        self._count(len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key, value):
+        """
+        Store a single value.
+
+        @param key (str): The cache key.
+        @param value (str): The value to cache.
+        @ret: None.
+        """
+        self.set_many({key: value})
+
+    def set_many(self, items):
+        """
+        Store several values at once and evict old entries if the cache is full.
+
+        @param items (dict): A dictionary mapping cache keys to values.
+        @ret: None.
+        """
+        if not items:
+            return
+        now = time.time()
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, accessed_at) VALUES (?, ?, ?);",
+            [(key, value, now) for key, value in items.items()]
+        )
+        self._evict(conn, len(items))
+
+    def _evict(self, conn, written):
+        """
+        Delete the least recently used entries once the cache exceeds its size limit.
+        The table is counted only when the estimated size or the rows written since
+        the last count call for it.
+
+        @param conn (sqlite3.Connection): The SQLite connection.
+        @param written (int): The number of rows just written.
+        @ret: None.
+        """
+        check_interval = max(1, int(self.max_entries * self.evict_fraction))
+        with self._lock:
+            self._written += written
+            if self._size is not None:
+                self._size += written
+                if self._size <= self.max_entries and self._written < check_interval:
+                    return
+            self._written = 0
+            self._size = conn.execute("SELECT COUNT(*) FROM cache;").fetchone()[0]
+            if self._size <= self.max_entries:
+                return
+            excess = self._size - self.max_entries + check_interval
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?);",
+                (excess,)
+            )
+            self._size -= excess
+        logging.info(f"Evicted {excess} entries from cache '{self.path}'.")
+
+    def stats(self):
+        """
+        Report the hit and miss counters of this cache instance.
+
+        @param: None.
+        @ret (dict): A dictionary with 'hits', 'misses' and 'hit_rate' keys.
+        """
+        lookups = self.hits + self.misses
+        hit_rate = self.hits / lookups if lookups else 0.0
+        return {'hits': self.hits, 'misses': self.misses, 'hit_rate': hit_rate}
+
+    def log_stats(self, name):
+        """
+        Log the hit and miss counters of this cache instance.
+
+        @param name (str): The name of the cache shown in the log message.
+        @ret: None.
+        """
+        stats = self.stats()
+        logging.info(f"{name} cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1%} hit rate).")
@@ -3,19 +3,29 @@ from .create_tables import (
     create_content_table,
     create_preprocessed_content_table,
     create_language_table,
+    create_entities_table,
     create_vader_sentiment_table,
     create_roberta_sentiment_table,
     create_geospatial_analysis_table
 )
 from .insert_data import (
+    upsert_rows,
+    copy_upsert,
     insert_content_data,
     insert_preprocessed_content_data,
     insert_language_data,
+    insert_language_code_data,
+    insert_entity_data,
     insert_geospatial_data,
     insert_vader_sentiment_data,
     insert_roberta_sentiment_data
 )
-from .fetch_data import fetch_content_data, fetch_language_data, fetch_geospatial_data
+from .update_data import relabel_vader_sentiment, relabel_roberta_sentiment
+from .fetch_data import (
+    stream_query,
+    stream_table_frames,
+    split_table_frame
+)
 
 def initialize_database():
     """
@@ -40,6 +50,7 @@ def create_database_tables(cursor, table_name):
     create_content_table(cursor, table_name)
     create_preprocessed_content_table(cursor, table_name)
     create_language_table(cursor, table_name)
+    create_entities_table(cursor, table_name)
     create_vader_sentiment_table(cursor, table_name)
     create_roberta_sentiment_table(cursor, table_name)
     create_geospatial_analysis_table(cursor, table_name)
\ No newline at end of file
@@ -34,7 +34,8 @@ def create_preprocessed_content_table(cursor, table_name):
 
 def create_language_table(cursor, table_name):
     """
-    Create a table that stores the post's language and id.
+    Create a table that stores the post's language and id, along with the language code
+    used for translation, which is detected locally when the language is missing or unknown.
 
     @param cursor (object): A cursor object to execute database commands.
     @param table_name (str): The name of the table.
@@ -44,14 +45,39 @@ def create_language_table(cursor, table_name):
     CREATE TABLE IF NOT EXISTS {table_name}_language (
         {table_name}_id INT PRIMARY KEY,
         language TEXT,
+        language_code TEXT,
         FOREIGN KEY ({table_name}_id) REFERENCES {table_name}(id)
     );
+    ALTER TABLE {table_name}_language ADD COLUMN IF NOT EXISTS language_code TEXT;
+    """
+    cursor.execute(create_table_query)
+
+def create_entities_table(cursor, table_name):
+    """
+    Create the named entities table if it doesn't exist. Holds the spaCy entities and
+    custom pattern matches found in each post, with character offsets into the translated text.
+    
+    @param cursor (object): A cursor object to execute database commands.
+    @param table_name (str): The name of the table.
+    @ret: None
+    """
+    create_table_query = f"""
+    CREATE TABLE IF NOT EXISTS {table_name}_entities (
+        {table_name}_content_id INT,
+        entity TEXT,
+        label TEXT,
+        start_char INT,
+        end_char INT,
+        PRIMARY KEY ({table_name}_content_id, start_char, end_char, label),
+        FOREIGN KEY ({table_name}_content_id) REFERENCES {table_name}_content({table_name}_id)
+    );
     """
     cursor.execute(create_table_query)
 
 def create_vader_sentiment_table(cursor, table_name):
     """
-    Create the vader sentiment analysis table if it doesn't exist.
+    Create the vader sentiment analysis table if it doesn't exist. Stores the label
+    along with the neg, neu, pos and compound scores it was derived from.
     
     @param cursor (object): A cursor object to execute database commands.
     @param table_name (str): The name of the table.
@@ -61,14 +87,24 @@ def create_vader_sentiment_table(cursor, table_name):
     CREATE TABLE IF NOT EXISTS {table_name}_sentiment_vader (
         {table_name}_content_processed_id INT PRIMARY KEY,
         sentiment TEXT,
+        neg REAL,
+        neu REAL,
+        pos REAL,
+        compound REAL,
         FOREIGN KEY ({table_name}_content_processed_id) REFERENCES {table_name}_content_processed({table_name}_content_id)
     );
+    ALTER TABLE {table_name}_sentiment_vader
+        ADD COLUMN IF NOT EXISTS neg REAL,
+        ADD COLUMN IF NOT EXISTS neu REAL,
+        ADD COLUMN IF NOT EXISTS pos REAL,
+        ADD COLUMN IF NOT EXISTS compound REAL;
     """
     cursor.execute(create_table_query)
 
 def create_roberta_sentiment_table(cursor, table_name):
     """
-    Create the roberta sentiment analysis table if it doesn't exist.
+    Create the roberta sentiment analysis table if it doesn't exist. Stores the label
+    along with the negative, neutral and positive probabilities it was derived from.
     
     @param cursor (object): A cursor object to execute database commands.
     @param table_name (str): The name of the table.
@@ -78,8 +114,15 @@ def create_roberta_sentiment_table(cursor, table_name):
     CREATE TABLE IF NOT EXISTS {table_name}_sentiment_roberta (
         {table_name}_content_id INT PRIMARY KEY,
         sentiment TEXT,
+        negative REAL,
+        neutral REAL,
+        positive REAL,
         FOREIGN KEY ({table_name}_content_id) REFERENCES {table_name}_content({table_name}_id)
     );
+    ALTER TABLE {table_name}_sentiment_roberta
+        ADD COLUMN IF NOT EXISTS negative REAL,
+        ADD COLUMN IF NOT EXISTS neutral REAL,
+        ADD COLUMN IF NOT EXISTS positive REAL;
     """
     cursor.execute(create_table_query)
 
@@ -1,54 +1,77 @@
-import numpy as np
+import os
+import uuid
+import polars as pl
 
-def fetch_content_data(cursor, table_name):
-    """
-    Fetch content data from the specified table.
+# Number of rows per streamed chunk, and per network round trip of the server-side cursor
+FETCH_CHUNK_SIZE = int(os.getenv('FETCH_CHUNK_SIZE', 50_000))
 
-    @param cursor (object): A cursor object to execute database commands.
-    @param table_name (str): The name of the table.
-    @ret (np.ndarray): A NumPy array of shape (n, 2) formatted as [[id, content], ...].
-    """
-    cursor.execute(f"SELECT id, content FROM {table_name};")
-    data = cursor.fetchall() # Initially stored as a list of tuples
+# Columns of the single-scan table frame. Coordinates are read as text, as the geospatial stage parses them itself.
+TABLE_FRAME_SCHEMA = {
+    'id': pl.Int64,
+    'content': pl.Utf8,
+    'language': pl.Utf8,
+    'longitude': pl.Utf8,
+    'latitude': pl.Utf8,
+    'location': pl.Utf8,
+}
 
-    formatted_data = np.array([[row[0], row[1]] for row in data])
-    return formatted_data
+# Rows with a location in the US are left out of the geospatial analysis
+GEOSPATIAL_PREDICATE = (
+    pl.col('longitude').is_not_null()
+    & pl.col('latitude').is_not_null()
+    & pl.col('location').is_not_null()
+    & ~pl.col('location').str.contains('US', literal=True)
+    & ~pl.col('location').str.contains('United States', literal=True)
+)
 
-def fetch_language_data(cursor, table_name):
+def stream_query(cursor, query, chunk_size=FETCH_CHUNK_SIZE):
     """
-    Fetch content language data from the specified table.
+    Run a query on a named (server-side) cursor and yield its rows in fixed-size chunks,
+    so only one chunk is held in memory at a time whatever the size of the result.
 
-    @param cursor (object): A cursor object to execute database commands.
-    @param table_name (str): The name of the table.
-    @ret (np.ndarray): A NumPy array of shape (n, 2) formatted as [[id, language], ...].
+    @param cursor (object): A cursor object whose connection runs the query.
+    @param query (str): The query to run.
+    @param chunk_size (int): The number of rows per chunk. Also used as the cursor's itersize.
+    @ret (generator): Lists of up to chunk_size row tuples.
     """
-    cursor.execute(f"SELECT id, language FROM {table_name};")
-    data = cursor.fetchall() # Initially stored as a list of tuples
-
-    formatted_data = np.array([[row[0], row[1]] for row in data])
-    return formatted_data
+    with cursor.connection.cursor(name=f"stream_{uuid.uuid4().hex}") as stream:
+        stream.itersize = chunk_size
+        stream.execute(query)
+        while True:
+            rows = stream.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
 
-def fetch_geospatial_data(cursor, table_name):
+def stream_table_frames(cursor, table_name, chunk_size=FETCH_CHUNK_SIZE):
     """
-    Fetch data relevant to geospatial analysis from the specified table.
-    Avoid fetching data that explicitly states it's from US locations.
+    Stream the content, language and geospatial columns of the specified table in a
+    single scan, as columnar chunks.
 
     @param cursor (object): A cursor object to execute database commands.
     @param table_name (str): The name of the table.
-    @ret (np.ndarray): A NumPy array of shape (n, 4) formatted as [[id, longitude, latitude, location], ...].
+    @param chunk_size (int): The number of rows per chunk.
+    @ret (generator): Polars DataFrames with the columns of TABLE_FRAME_SCHEMA.
     """
     fetch_query = f"""
-        SELECT id, longitude, latitude, location
-        FROM {table_name}
-        WHERE longitude IS NOT NULL 
-          AND latitude IS NOT NULL 
-          AND location IS NOT NULL 
-          AND location NOT LIKE '%US%' 
-          AND location NOT LIKE '%United States%';
+        SELECT id, content, language, longitude::TEXT, latitude::TEXT, location
+        FROM {table_name};
     """
-    cursor.execute(fetch_query)
-    data = cursor.fetchall()  # This will be a list of tuples
+    for rows in stream_query(cursor, fetch_query, chunk_size):
+        yield pl.DataFrame(rows, schema=TABLE_FRAME_SCHEMA, orient='row')
 
-    # Convert each tuple to a list and then to a NumPy array
-    formatted_data = np.array([list(row) for row in data])
-    return formatted_data
\ No newline at end of file
+def split_table_frame(frame):
+    """
+    Derive the content, language and geospatial data from a table frame. Only rows
+    passing GEOSPATIAL_PREDICATE are kept in the geospatial data.
+
+    @param frame (pl.DataFrame): A DataFrame with the columns of TABLE_FRAME_SCHEMA.
+    @ret (tuple): A tuple containing:
+        - (np.ndarray): The content data, formatted as [[id, content], ...].
+        - (np.ndarray): The language data, formatted as [[id, language], ...].
+        - (np.ndarray): The geospatial data, formatted as [[id, longitude, latitude, location], ...].
+    """
+    content_data = frame.select('id', 'content').to_numpy()
+    language_data = frame.select('id', 'language').to_numpy()
+    geospatial_data = frame.filter(GEOSPATIAL_PREDICATE).select('id', 'longitude', 'latitude', 'location').to_numpy()
+    return content_data, language_data, geospatial_data
@@ -1,3 +1,114 @@
+import io
+import os
+import math
+import time
+import uuid
+import logging
+
+# Writes of at least this many rows are bulk loaded with COPY instead of executemany
+BULK_LOAD_THRESHOLD = int(os.getenv('BULK_LOAD_THRESHOLD', 10_000))
+
+# Number of rows streamed to the server per COPY, bounding the memory of the buffer
+COPY_CHUNK_SIZE = 100_000
+
+def format_copy_value(value):
+    """
+    Format a value as a field of PostgreSQL's COPY text format.
+
+    @param value (object): The value. None is written as NULL.
+    @ret (str): The escaped field.
+    """
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+def copy_upsert(cursor, table, columns, rows, conflict_columns, update_columns):
+    """
+    Upsert rows by streaming them with COPY into a temporary staging table, followed by
+    a single set-based INSERT ... ON CONFLICT into the target table. When a key appears
+    more than once, the last row wins, as with executemany.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param table (str): The name of the target table.
+    @param columns (list of str): The columns of the rows.
+    @param rows (list of tuples): The rows to write.
+    @param conflict_columns (list of str): The key columns, or None to skip rows that conflict with any constraint.
+    @param update_columns (list of str): The columns updated on a key conflict.
+    @ret: None.
+    """
+    # The pg_temp schema keeps every statement off permanent tables, the unique name avoids clashing with another
+    # staging table, and ON COMMIT DROP removes the table at commit even if the final DROP is never reached
+    staging_table = f"pg_temp.{table}_staging_{uuid.uuid4().hex[:8]}"
+    column_list = ", ".join(columns)
+    cursor.execute(f"""
+        CREATE TEMP TABLE {staging_table} ON COMMIT DROP AS SELECT {column_list} FROM {table} WITH NO DATA;
+        ALTER TABLE {staging_table} ADD COLUMN staging_row BIGSERIAL;
+    """)
+
+    for start in range(0, len(rows), COPY_CHUNK_SIZE):
+        buffer = io.StringIO()
+        for row in rows[start:start + COPY_CHUNK_SIZE]:
+            buffer.write("\t".join(format_copy_value(value) for value in row))
+            buffer.write("\n")
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {staging_table} ({column_list}) FROM STDIN", buffer)
+
+    if conflict_columns:
+        key_list = ", ".join(conflict_columns)
+        updates = ",\n".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT DISTINCT ON ({key_list}) {column_list} FROM {staging_table}
+            ORDER BY {key_list}, staging_row DESC
+            ON CONFLICT ({key_list}) DO UPDATE SET
+            {updates};
+        """)
+    else:
+        cursor.execute(f"""
+            INSERT INTO {table} ({column_list})
+            SELECT {column_list} FROM {staging_table}
+            ON CONFLICT DO NOTHING;
+        """)
+    cursor.execute(f"DROP TABLE {staging_table};")
+
+def upsert_rows(cursor, table, columns, rows, conflict_columns, update_columns, threshold=BULK_LOAD_THRESHOLD):
+    """
+    Insert or update rows in a table, with executemany for small writes and with
+    copy_upsert from the threshold up. Logs the write throughput.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param table (str): The name of the target table.
+    @param columns (list of str): The columns of the rows.
+    @param rows (iterable of sequences): The rows to write.
+    @param conflict_columns (list of str): The key columns, or None to skip rows that conflict with any constraint.
+    @param update_columns (list of str): The columns updated on a key conflict.
+    @param threshold (int): The minimum number of rows bulk loaded with COPY.
+    @ret: None.
+    """
+    rows = [tuple(row) for row in rows]
+    start_time = time.perf_counter()
+    if len(rows) >= threshold:
+        method = "COPY"
+        copy_upsert(cursor, table, columns, rows, conflict_columns, update_columns)
+    else:
+        method = "executemany"
+        if conflict_columns:
+            updates = ",\n".join(f"{column} = EXCLUDED.{column}" for column in update_columns)
+            conflict_clause = f"ON CONFLICT ({', '.join(conflict_columns)}) DO UPDATE SET\n{updates}"
+        else:
+            conflict_clause = "ON CONFLICT DO NOTHING"
+        insert_query = f"""
+            INSERT INTO {table} ({', '.join(columns)})
+            VALUES ({', '.join(['%s'] * len(columns))})
+            {conflict_clause};
+        """
+        cursor.executemany(insert_query, rows)
+
+    elapsed = time.perf_counter() - start_time
+    if rows:
+        throughput = len(rows) / elapsed if elapsed else float('inf')
+        logging.info(f"Wrote {len(rows)} rows to {table} with {method} in {elapsed:.2f} seconds ({throughput:.0f} rows/s).")
+
 def insert_content_data(cursor, data, table_name):
     """
     Insert fetched content into the specified content table.
@@ -6,13 +117,8 @@ def insert_content_data(cursor, data, table_name):
     @param data (list of lists): A list of lists containing the content data to be inserted. Each list should be in the format [id, content].
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_content ({table_name}_id, content)
-        VALUES (%s, %s)
-        ON CONFLICT ({table_name}_id) DO UPDATE SET
-        content = EXCLUDED.content
-    """
-    cursor.executemany(insert_query, data)
+    upsert_rows(cursor, f"{table_name}_content", [f"{table_name}_id", "content"], data,
+                conflict_columns=[f"{table_name}_id"], update_columns=["content"])
 
 def insert_preprocessed_content_data(cursor, data, table_name):
     """
@@ -22,13 +128,24 @@ def insert_preprocessed_content_data(cursor, data, table_name):
     @param data (list of lists): A list of lists containing the processed content data to be inserted. Each list should be in the format [content_id, processed_content].
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_content_processed ({table_name}_content_id, processed_content)
-        VALUES (%s, %s)
-        ON CONFLICT ({table_name}_content_id) DO UPDATE SET
-        processed_content = EXCLUDED.processed_content
+    upsert_rows(cursor, f"{table_name}_content_processed", [f"{table_name}_content_id", "processed_content"], data,
+                conflict_columns=[f"{table_name}_content_id"], update_columns=["processed_content"])
+
+def insert_entity_data(cursor, ids, data, table_name):
     """
-    cursor.executemany(insert_query, data)
+    Replace the named entities of the given posts in the specified entities table.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param ids (list): The IDs of every post whose entities were extracted, including posts without entities.
+    @param data (list of lists): A list of lists containing the entities to be inserted. Each list should be in the format [content_id, entity, label, start_char, end_char].
+    @ret: None.
+    """
+    # Drop stale entities so reprocessed posts only keep their current ones
+    delete_query = f"DELETE FROM {table_name}_entities WHERE {table_name}_content_id = ANY(%s::INT[]);"
+    cursor.execute(delete_query, ([str(id_) for id_ in ids],))
+
+    upsert_rows(cursor, f"{table_name}_entities", [f"{table_name}_content_id", "entity", "label", "start_char", "end_char"], data,
+                conflict_columns=None, update_columns=[])
 
 def insert_language_data(cursor, data, table_name):
     """
@@ -38,13 +155,19 @@ def insert_language_data(cursor, data, table_name):
     @param data (list of lists): A list of lists containing the language data to be inserted. Each list should be in the format [id, language].
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_language ({table_name}_id, language)
-        VALUES (%s, %s)
-        ON CONFLICT ({table_name}_id) DO UPDATE SET
-        language = EXCLUDED.language
+    upsert_rows(cursor, f"{table_name}_language", [f"{table_name}_id", "language"], data,
+                conflict_columns=[f"{table_name}_id"], update_columns=["language"])
+
+def insert_language_code_data(cursor, data, table_name):
+    """
+    Insert the resolved language codes into the specified language table.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param data (list of lists): A list of lists containing the language codes to be inserted. Each list should be in the format [id, language_code].
+    @ret: None.
     """
-    cursor.executemany(insert_query, data)
+    upsert_rows(cursor, f"{table_name}_language", [f"{table_name}_id", "language_code"], data,
+                conflict_columns=[f"{table_name}_id"], update_columns=["language_code"])
 
 def insert_geospatial_data(cursor, data, table_name):
     """
@@ -54,48 +177,32 @@ def insert_geospatial_data(cursor, data, table_name):
     @param data (list of lists): A list of lists containing the geospatial data to be inserted. Each list should be in the format [content_id, longitude, latitude, location].
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_geospatial ({table_name}_content_id, longitude, latitude, location)
-        VALUES (%s, %s, %s, %s)
-        ON CONFLICT ({table_name}_content_id) DO UPDATE SET
-        longitude = EXCLUDED.longitude,
-        latitude = EXCLUDED.latitude,
-        location = EXCLUDED.location;
-    """
-    cursor.executemany(insert_query, data)
+    upsert_rows(cursor, f"{table_name}_geospatial", [f"{table_name}_content_id", "longitude", "latitude", "location"], data,
+                conflict_columns=[f"{table_name}_content_id"], update_columns=["longitude", "latitude", "location"])
 
 def insert_vader_sentiment_data(cursor, data, table_name):
     """
     Insert VADER sentiment analysis results into the specified VADER sentiment table.
 
     @param cursor (object): A cursor object to execute database commands.
-    @param data (list of lists): A list of lists containing the VADER sentiment analysis results. Each list should be in the format [content_processed_id, _, sentiment].
+    @param data (np.ndarray): A structured NumPy array containing the VADER sentiment analysis results, with 'id', 'sentiment', 'neg', 'neu', 'pos' and 'compound' fields.
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_sentiment_vader ({table_name}_content_processed_id, sentiment)
-        VALUES (%s, %s)
-        ON CONFLICT ({table_name}_content_processed_id) DO UPDATE SET
-        sentiment = EXCLUDED.sentiment;
-    """ 
-    # Convert to list of tuples for executemany
-    formatted_data = [(item[0], item[2]) for item in data]
-    cursor.executemany(insert_query, formatted_data)
+    # Convert to rows, with the float32 scores as Python floats
+    scores = [data[field].tolist() for field in ('neg', 'neu', 'pos', 'compound')]
+    formatted_data = zip(data['id'], data['sentiment'], *scores)
+    upsert_rows(cursor, f"{table_name}_sentiment_vader", [f"{table_name}_content_processed_id", "sentiment", "neg", "neu", "pos", "compound"], formatted_data,
+                conflict_columns=[f"{table_name}_content_processed_id"], update_columns=["sentiment", "neg", "neu", "pos", "compound"])
 
 def insert_roberta_sentiment_data(cursor, data, table_name):
     """
     Insert RoBERTa sentiment analysis results into the specified RoBERTa sentiment table.
 
     @param cursor (object): A cursor object to execute database commands.
-    @param data (list of lists): A list of lists containing the RoBERTa sentiment analysis results. Each list should be in the format [content_id, _, sentiment].
+    @param data (list of lists): A list of lists containing the RoBERTa sentiment analysis results. Each list should be in the format [content_id, _, sentiment, negative, neutral, positive].
     @ret: None.
     """
-    insert_query = f"""
-        INSERT INTO {table_name}_sentiment_roberta ({table_name}_content_id, sentiment)
-        VALUES (%s, %s)
-        ON CONFLICT ({table_name}_content_id) DO UPDATE SET
-        sentiment = EXCLUDED.sentiment;
-    """ 
-    # Convert to list of tuples for executemany
-    formatted_data = [(item[0], item[2]) for item in data]
-    cursor.executemany(insert_query, formatted_data)
\ No newline at end of file
+    # Convert to rows, storing the missing neutral probability of two-class models as NULL
+    formatted_data = [(item[0], item[2], item[3], None if math.isnan(item[4]) else item[4], item[5]) for item in data]
+    upsert_rows(cursor, f"{table_name}_sentiment_roberta", [f"{table_name}_content_id", "sentiment", "negative", "neutral", "positive"], formatted_data,
+                conflict_columns=[f"{table_name}_content_id"], update_columns=["sentiment", "negative", "neutral", "positive"])
\ No newline at end of file
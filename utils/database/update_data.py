@@ -0,0 +1,55 @@
+def relabel_vader_sentiment(cursor, table_name, positive_threshold, negative_threshold):
+    """
+    Re-derive the VADER sentiment labels of a whole table from the stored compound scores.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param table_name (str): The name of the table.
+    @param positive_threshold (float): The minimum compound score labeled 'Positive', see VADER_POSITIVE_THRESHOLD.
+    @param negative_threshold (float): The maximum compound score labeled 'Negative', see VADER_NEGATIVE_THRESHOLD.
+    @ret (int): The number of relabeled rows.
+    """
+    update_query = f"""
+        UPDATE {table_name}_sentiment_vader SET
+        sentiment = CASE
+            WHEN compound >= %s THEN 'Positive'
+            WHEN compound <= %s THEN 'Negative'
+            ELSE 'Neutral'
+        END
+        WHERE compound IS NOT NULL;
+    """
+    cursor.execute(update_query, (positive_threshold, negative_threshold))
+    return cursor.rowcount
+
+
+def relabel_roberta_sentiment(cursor, table_name, neutral_threshold, slight_threshold):
+    """
+    Re-derive the RoBERTa sentiment labels of a whole table from the stored class
+    probabilities, with the same rules as label_probabilities. Rows without a neutral
+    probability are labeled 'Negative' or 'Positive'.
+
+    @param cursor (object): A cursor object to execute database commands.
+    @param table_name (str): The name of the table.
+    @param neutral_threshold (float): Threshold for neutral classification, see the model's registry entry.
+    @param slight_threshold (float): Threshold for slight classification, see the model's registry entry.
+    @ret (int): The number of relabeled rows.
+    """
+    # The highest class is negative on ties with the others, and neutral on ties with positive
+    negative_highest = "negative >= neutral AND negative >= positive"
+    neutral_highest = "neutral > negative AND neutral >= positive"
+    positive_highest = "positive > negative AND positive > neutral"
+    update_query = f"""
+        UPDATE {table_name}_sentiment_roberta SET
+        sentiment = CASE
+            WHEN neutral IS NULL THEN CASE WHEN positive > negative THEN 'Positive' ELSE 'Negative' END
+            WHEN {neutral_highest} AND neutral > %(neutral_threshold)s THEN 'Neutral'
+            WHEN {positive_highest} AND neutral > %(slight_threshold)s THEN 'Slightly Positive'
+            WHEN {negative_highest} AND neutral > %(slight_threshold)s THEN 'Slightly Negative'
+            WHEN {positive_highest} THEN 'Positive'
+            WHEN {negative_highest} THEN 'Negative'
+            WHEN negative > positive THEN 'Slightly Negative'
+            ELSE 'Slightly Positive'
+        END
+        WHERE negative IS NOT NULL AND positive IS NOT NULL;
+    """
+    cursor.execute(update_query, {'neutral_threshold': neutral_threshold, 'slight_threshold': slight_threshold})
+    return cursor.rowcount
@@ -2,4 +2,16 @@
 from .table_utils import validate_table_name, get_table_name_from_user, check_table_exists
 
 # Import language_codes.py dictionary
-from .language_codes import language_mapping
\ No newline at end of file
+from .language_codes import language_mapping
+
+# Import lazy_loading.py functions
+from .lazy_loading import lazy_load, get_peak_rss_mb, log_startup_report
+
+# Import dedup.py functions
+from .dedup import deduplicate
+
+# Import prefetch.py functions
+from .prefetch import prefetch
+
+# Import worker_pool.py classes and functions
+from .worker_pool import PersistentWorkerPool, get_shared_pool, shutdown_shared_pool
@@ -0,0 +1,18 @@
+import logging
+
+def deduplicate(values, description="inputs"):
+    """
+    Collapse identical values so each one is processed only once.
+
+    @param values (iterable): The hashable values to deduplicate.
+    @param description (str): What the values are, used in the log message.
+    @ret unique_values (list): The unique values, in order of first appearance.
+    @ret inverse (list of int): For each input value, the index of its unique value.
+    """
+    value_to_index = {}
+    inverse = [value_to_index.setdefault(value, len(value_to_index)) for value in values]
+    unique_values = list(value_to_index)
+    if inverse:
+        duplicate_rate = 1 - len(unique_values) / len(inverse)
+        logging.info(f"Collapsed {len(inverse)} {description} into {len(unique_values)} unique ones ({duplicate_rate:.1%} duplicates).")
+    return unique_values, inverse
@@ -0,0 +1,70 @@
+import functools
+import logging
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+# Seconds spent loading each lazily initialized component, in load order
+load_times = {}
+
+def lazy_load(name):
+    """
+    Decorator that defers a heavy loader until its first call, caches the result,
+    and records how long the load took for the startup report.
+
+    @param name (str): The name of the component shown in the startup report.
+    @ret (function): The decorator.
+    """
+    def decorator(loader):
+        @functools.wraps(loader)
+        @functools.lru_cache(maxsize=None)
+        def wrapper():
+            start_time = time.perf_counter()
+            component = loader()
+            load_times[name] = time.perf_counter() - start_time
+            logging.info(f"Loaded {name} in {load_times[name]:.2f} seconds.")
+            return component
+        return wrapper
+    return decorator
+
+def get_peak_rss_mb(pid=None):
+    """
+    Get the peak resident set size of the current process or of another process.
+
+    @param pid (int): The ID of another process to measure. Only supported on Linux.
+    @ret (float or None): The peak RSS in megabytes, or None if it cannot be measured on this platform.
+    """
+    if pid is not None:
+        try:
+            with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+                for line in f:
+                    if line.startswith("VmHWM:"):
+                        return int(line.split()[1]) / 1024
+        except OSError:
+            return None
+        return None
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+    return peak_rss / (1024 * 1024) if sys.platform == 'darwin' else peak_rss / 1024
+
+def log_startup_report(import_seconds):
+    """
+    Log the time spent importing the program and loading each component, and the peak memory use.
+
+    @param import_seconds (float): The time spent importing the program's modules.
+    @ret: None.
+    """
+    logging.info(f"Startup report: imports took {import_seconds:.2f} seconds.")
+    if not load_times:
+        logging.info("Startup report: no heavy components were loaded.")
+    for name, seconds in load_times.items():
+        logging.info(f"Startup report: {name} loaded in {seconds:.2f} seconds.")
+    peak_rss = get_peak_rss_mb()
+    if peak_rss is not None:
+        logging.info(f"Startup report: peak memory use {peak_rss:.0f} MB.")
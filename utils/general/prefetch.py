@@ -0,0 +1,47 @@
+import queue
+import threading
+
+# Marks the end of the prefetched items
+_DONE = object()
+
+def prefetch(iterable, depth=2):
+    """
+    Produce the items of an iterable in a background thread while the caller consumes
+    earlier ones. At most depth items wait in the queue, so memory stays bounded.
+
+    @param iterable (iterable): The items to produce, e.g. a generator of batches.
+    @param depth (int): The maximum number of produced items waiting to be consumed.
+    @ret (generator): The items, in order. An error raised by the iterable is re-raised in the caller.
+    """
+    items = queue.Queue(maxsize=depth)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    return
+                items.put(item)
+        except BaseException as e:
+            items.put(e)
+            return
+        items.put(_DONE)
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = items.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        # Let the producer finish if the caller stops early
+        stop.set()
+        while producer.is_alive():
+            try:
+                items.get_nowait()
+            except queue.Empty:
+                producer.join(timeout=0.01)
@@ -0,0 +1,112 @@
+import os
+import time
+import logging
+import concurrent.futures
+from .lazy_loading import get_peak_rss_mb
+
+# Warm-up barrier of this worker process, set once by the pool initializer
+_worker_barrier = {}
+
+# Pools shared across the run, by name, with the settings each was started with
+_shared_pools = {}
+
+def _initialize_worker(barrier, initializer, initargs):
+    """
+    Pool initializer: keep the warm-up barrier, then run the pool's own initializer.
+
+    @param barrier (multiprocessing.Barrier): The barrier shared by all workers for the warm-up tasks.
+    @param initializer (callable): The initializer of the pool, run once per worker.
+    @param initargs (tuple): The arguments of the initializer.
+    @ret: None.
+    """
+    _worker_barrier['barrier'] = barrier
+    initializer(*initargs)
+
+def _report_worker(_):
+    """
+    Report the process ID of the worker running this task, once every worker holds one.
+
+    @param _ (int): Unused task index.
+    @ret (int): The worker's process ID.
+    """
+    # Hold the worker until all workers arrive, so no worker runs two warm-up tasks
+    _worker_barrier['barrier'].wait()
+    return os.getpid()
+
+class PersistentWorkerPool:
+    """
+    A process pool that is started once and reused. Every worker is started and
+    initialized when the pool is created, so the warm-up is not charged to the first
+    batch, and the workers' process IDs are kept for the memory report.
+    """
+    # Name of the pool in log messages, and what the workers share that every worker's RSS counts
+    name = 'worker'
+    shared_memory = 'shared pages'
+
+    def __init__(self, workers, context, initializer, initargs=()):
+        """
+        @param workers (int): The number of worker processes.
+        @param context (multiprocessing.context.BaseContext): The start method context of the workers.
+        @param initializer (callable): A module-level function run once in each worker.
+        @param initargs (tuple): The arguments of the initializer.
+        """
+        self.workers = workers
+        start_time = time.perf_counter()
+        self.executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, initializer=_initialize_worker,
+            initargs=(context.Barrier(workers), initializer, initargs)
+        )
+        self.pids = sorted(set(self.executor.map(_report_worker, range(workers))))
+        self.warm_up_seconds = time.perf_counter() - start_time
+        logging.info(f"Started {len(self.pids)} {self.name} workers ({context.get_start_method()}) in {self.warm_up_seconds:.2f} seconds.")
+
+    def log_memory_report(self):
+        """
+        Log the peak resident memory of the parent and each worker.
+
+        @param: None.
+        @ret: None.
+        """
+        parent_rss = get_peak_rss_mb()
+        worker_rss = [get_peak_rss_mb(pid) for pid in self.pids]
+        if parent_rss is None or None in worker_rss:
+            return
+        logging.info(
+            f"{self.name.capitalize()} memory: parent peak RSS {parent_rss:.0f} MB, worker peak RSS {min(worker_rss):.0f}-{max(worker_rss):.0f} MB "
+            f"across {len(worker_rss)} workers ({self.shared_memory} are counted in every worker)."
+        )
+
+    def shutdown(self):
+        """
+        Stop the worker processes.
+
+        @param: None.
+        @ret: None.
+        """
+        self.executor.shutdown()
+
+def get_shared_pool(name, settings, create_pool):
+    """
+    Return the pool shared by the run under a name, starting it on first use or
+    restarting it when different settings are requested.
+
+    @param name (str): The name of the shared pool.
+    @param settings (tuple): The settings the pool must have been started with.
+    @param create_pool (callable): Starts a pool with those settings.
+    @ret (PersistentWorkerPool): The worker pool.
+    """
+    if name in _shared_pools and _shared_pools[name][0] != settings:
+        shutdown_shared_pool(name)
+    if name not in _shared_pools:
+        _shared_pools[name] = (settings, create_pool())
+    return _shared_pools[name][1]
+
+def shutdown_shared_pool(name):
+    """
+    Stop the pool shared under a name, if it was started.
+
+    @param name (str): The name of the shared pool.
+    @ret: None.
+    """
+    if name in _shared_pools:
+        _shared_pools.pop(name)[1].shutdown()